@@ -0,0 +1,109 @@
+"""
+Recall-vs-latency benchmark of the gallery index backends against exact search
+
+Usage (from Backend/):
+    python -m benchmarks.ann_index                      # assets/embeddings.pkl
+    python -m benchmarks.ann_index --synthetic 100000   # synthetic gallery
+    python -m benchmarks.ann_index --nprobe 1 4 8 16 32 --output ann.json
+"""
+import argparse
+import json
+import pickle
+import time
+import numpy as np
+from services.gallery import EMBEDDING_DIM, l2_normalize
+from services.index import build_index
+
+
+def load_vectors(path, synthetic, seed):
+    """Gallery vectors from embeddings.pkl, or a synthetic gallery of the given size"""
+    if not synthetic:
+        with open(path, "rb") as f:
+            embeddings_dict = pickle.load(f)
+        return l2_normalize(list(embeddings_dict.values()))
+
+    # Face embeddings are far from uniform on the sphere; a low-rank mixing
+    # matrix gives the synthetic gallery a comparable clustered structure
+    rng = np.random.default_rng(seed)
+    latent = rng.standard_normal((synthetic, 64)).astype(np.float32)
+    mixing = rng.standard_normal((64, EMBEDDING_DIM)).astype(np.float32)
+    return l2_normalize(latent @ mixing)
+
+
+def make_queries(vectors, n_queries, noise, seed):
+    """Noisy copies of random gallery vectors, like repeat photos of enrolled people"""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(vectors), n_queries, replace=len(vectors) < n_queries)
+    noisy = vectors[picks] + noise * rng.standard_normal((n_queries, vectors.shape[1])).astype(np.float32)
+    return l2_normalize(noisy)
+
+
+def time_queries(index, queries, k):
+    """Per-query latencies (ms) at batch size 1 and the ids found"""
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    return np.array(latencies), np.array(found)
+
+
+def summarize(name, latencies, recall, build_s):
+    return {
+        "index": name,
+        "build_s": round(build_s, 3),
+        "recall_at_1": round(float(recall), 4),
+        "mean_ms": round(float(latencies.mean()), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="assets/embeddings.pkl")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use a synthetic gallery of this size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.02, help="Per-dimension query noise (std)")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF buckets (0 = sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.embeddings, args.synthetic, args.seed)
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    print(f"Gallery: {len(vectors)} x {vectors.shape[1]}, queries: {len(queries)}")
+
+    # Exact search is the ground truth
+    start = time.perf_counter()
+    exact = build_index(vectors, "exact")
+    build_s = time.perf_counter() - start
+    latencies, truth = time_queries(exact, queries, 1)
+    results = [summarize("exact", latencies, 1.0, build_s)]
+
+    start = time.perf_counter()
+    ivf = build_index(vectors, "ivf", nlist=args.nlist)
+    build_s = time.perf_counter() - start
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        latencies, found = time_queries(ivf, queries, 1)
+        recall = np.mean(found[:, 0] == truth[:, 0])
+        results.append(summarize(f"ivf(nlist={ivf.nlist}, nprobe={nprobe})", latencies, recall, build_s))
+
+    print(f"{'index':<32}{'recall@1':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in results:
+        print(f"{row['index']:<32}{row['recall_at_1']:>10.4f}{row['mean_ms']:>10.4f}"
+              f"{row['p50_ms']:>10.4f}{row['p95_ms']:>10.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"gallery_size": len(vectors), "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
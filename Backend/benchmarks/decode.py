@@ -0,0 +1,101 @@
+"""
+Upload decode latency: full decode + colour round trip vs reduced JPEG decode
+
+The baseline is the previous /recognize path (full-size IMREAD_COLOR, BGR->RGB
+in decode, RGB->BGR again before YOLO); the fast path is decode_frame(),
+which decodes large JPEGs at reduced resolution and stays in BGR.
+
+Usage (from Backend/):
+    python -m benchmarks.decode
+    python -m benchmarks.decode --image dataset/Aaron_Eckhart/Aaron_Eckhart_0001.jpg --quality 85
+    python -m benchmarks.decode --target 960 --output decode.json
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from services.manifest import scan_dataset
+from services.utils import DETECTOR_INPUT_SIZE, decode_frame
+
+# (label, width, height) of typical uploads
+UPLOAD_SIZES = [
+    ("VGA", 640, 480),
+    ("720p", 1280, 720),
+    ("1080p", 1920, 1080),
+    ("12MP phone", 4032, 3024),
+    ("4K", 3840, 2160),
+]
+
+
+def make_upload(source, width, height, quality):
+    """JPEG bytes of the source image resized to width x height"""
+    frame = cv2.resize(source, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    # Resizing a small image leaves it unnaturally smooth; mild noise gives
+    # the encoder camera-like high-frequency content to work through
+    noise = np.random.default_rng(0).normal(0, 4, frame.shape)
+    frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def baseline(img_bytes):
+    img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def best_of(fn, img_bytes, repeats):
+    """Fastest of several runs (ms), and the last output"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = fn(img_bytes)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Source image (default: first dataset image)")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality of the generated uploads")
+    parser.add_argument("--target", type=int, default=DETECTOR_INPUT_SIZE, help="Decode target size")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    path = args.image or sorted(scan_dataset(args.dataset)[1])[0][2]
+    source = cv2.imread(path)
+    if source is None:
+        raise SystemExit(f"Could not read {path}")
+
+    results = []
+    for label, width, height in UPLOAD_SIZES:
+        img_bytes = make_upload(source, width, height, args.quality)
+        base_ms, _ = best_of(baseline, img_bytes, args.repeats)
+        fast_ms, (frame, factor) = best_of(lambda b: decode_frame(b, args.target), img_bytes, args.repeats)
+        results.append({
+            "upload": label,
+            "size": f"{width}x{height}",
+            "kb": round(len(img_bytes) / 1024),
+            "baseline_ms": round(base_ms, 2),
+            "fast_ms": round(fast_ms, 2),
+            "factor": factor,
+            "decoded": f"{frame.shape[1]}x{frame.shape[0]}",
+            "speedup": round(base_ms / fast_ms, 2),
+        })
+
+    print(f"{'upload':<12}{'size':>11}{'KB':>7}{'baseline ms':>13}{'fast ms':>10}{'factor':>8}{'decoded':>11}{'speedup':>9}")
+    for row in results:
+        print(f"{row['upload']:<12}{row['size']:>11}{row['kb']:>7}{row['baseline_ms']:>13.2f}{row['fast_ms']:>10.2f}"
+              f"{row['factor']:>8}{row['decoded']:>11}{row['speedup']:>8.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"target_size": args.target, "quality": args.quality, "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
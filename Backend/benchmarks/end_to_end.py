@@ -0,0 +1,304 @@
+"""
+End-to-end recognition benchmark: latency percentiles, throughput, memory
+
+Drives the production path (decode_upload -> RecognitionPipeline) over the
+dataset images, configured like the API (config.py / environment), in two
+parts:
+
+1. Stage breakdown: images run one at a time and every stage is timed
+   (decode, optional enhancement, super-resolution, YOLO, FaceNet, match);
+   p50/p95/p99 per stage. SR and YOLO are timed by wrapping the registry's
+   model objects for the duration of this pass.
+2. Concurrency sweep: N client threads send the images through the
+   pipeline (or a MicroBatcher with --batching); end-to-end latency
+   percentiles and throughput per level.
+
+Peak RSS is sampled throughout. Results are saved as JSON; --compare prints
+the change against an earlier run, e.g. one taken on the previous commit.
+
+Usage (from Backend/):
+    python -m benchmarks.end_to_end --output e2e.json
+    python -m benchmarks.end_to_end --limit 200 --concurrency 1 4 8 --batching
+    python -m benchmarks.end_to_end --enhance --output e2e_new.json --compare e2e.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import config
+from services.gallery import load_gallery
+from services.manifest import scan_dataset
+from services.model_registry import get_model, registry, set_backend
+from services.pipeline import RecognitionPipeline
+from services.preprocessing import enhance_image
+from services.utils import decode_upload
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values):
+    """p50/p95/p99, mean and max of a list of milliseconds"""
+    if not values:
+        return None
+    values = np.asarray(values)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 2)
+    summary["max"] = round(float(values.max()), 2)
+    return summary
+
+
+class RssSampler:
+    def __init__(self, interval=0.05):
+        """Background thread tracking the peak resident set size (MB)"""
+        import psutil
+
+        self._process = psutil.Process()
+        self._interval = interval
+        self._stop = threading.Event()
+        self.peak_mb = self._process.memory_info().rss / 2 ** 20
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.peak_mb = max(self.peak_mb, self._process.memory_info().rss / 2 ** 20)
+
+    def reset(self):
+        """Restart peak tracking from the current RSS"""
+        self.peak_mb = self._process.memory_info().rss / 2 ** 20
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class StageTimer:
+    def __init__(self):
+        """Times calls to the SR and YOLO models while installed"""
+        self.current = {}
+        self._restore = []
+
+    def _wrap(self, model, method, stage):
+        original = getattr(model, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.current[stage] = self.current.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+        setattr(model, method, timed)
+        self._restore.append((model, method))
+
+    def __enter__(self):
+        self._wrap(get_model("super_resolution"), "upsample", "sr_ms")
+        self._wrap(get_model("yolo_face"), "predict", "yolo_ms")
+        return self
+
+    def __exit__(self, *exc):
+        # Removing the instance attribute uncovers the class method again
+        for model, method in self._restore:
+            delattr(model, method)
+
+
+def load_uploads(dataset, limit):
+    """Encoded bytes and expected label of the dataset images"""
+    items = sorted(scan_dataset(dataset)[1])
+    if limit:
+        items = items[:limit]
+    uploads = []
+    for person, _, path in items:
+        with open(path, "rb") as f:
+            uploads.append((person, f.read()))
+    return uploads
+
+
+def recognize(pipeline, data, args, runner=None):
+    """One request: decode, optional enhancement, recognition"""
+    frame, timings = decode_upload(data, args.target)
+    if frame is None:
+        return None, timings
+    if args.enhance:
+        start = time.perf_counter()
+        frame = cv2.cvtColor(enhance_image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), cv2.COLOR_RGB2BGR)
+        timings["enhance_ms"] = (time.perf_counter() - start) * 1000
+    if runner is not None:
+        return runner.submit(frame, timings).result(), timings
+    return pipeline.run(frame, timings), timings
+
+
+def stage_breakdown(pipeline, uploads, args):
+    """Sequential pass with per-stage timings; also measures match accuracy"""
+    stages = {}
+    correct = 0
+    with StageTimer() as timer:
+        for person, data in uploads:
+            timer.current = {}
+            start = time.perf_counter()
+            result, timings = recognize(pipeline, data, args)
+            total = (time.perf_counter() - start) * 1000
+            if result is None:
+                continue
+
+            timings.update(timer.current)
+            timings["total_ms"] = total
+            for stage, value in timings.items():
+                if stage.endswith("_ms"):
+                    stages.setdefault(stage, []).append(value)
+            correct += result["identity"] == person
+
+    order = ["decode_ms", "enhance_ms", "sr_ms", "yolo_ms", "detect_ms", "embed_ms", "match_ms", "total_ms"]
+    return ({stage: percentiles(stages[stage]) for stage in order if stage in stages},
+            correct / len(uploads) if uploads else 0.0)
+
+
+def concurrency_level(pipeline, uploads, args, clients, sampler):
+    """Throughput and end-to-end latency with `clients` concurrent senders"""
+    runner = None
+    if args.batching:
+        from services.batcher import MicroBatcher
+        runner = MicroBatcher(pipeline, config.RECOGNIZE_BATCH_SIZE, config.RECOGNIZE_BATCH_WAIT_MS)
+
+    requests = [data for _ in range(args.rounds) for _, data in uploads]
+    latencies = []
+
+    def send(data):
+        start = time.perf_counter()
+        recognize(pipeline, data, args, runner)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    sampler.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(send, requests))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "clients": clients,
+        "requests": len(requests),
+        "throughput_rps": round(len(requests) / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "peak_rss_mb": round(sampler.peak_mb, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Print the change of the headline numbers against an earlier report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nChange vs {baseline_path} (commit {baseline.get('commit')}):")
+    for stage, summary in report["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old:
+            print(f"  {stage:<12} p50 {change(summary['p50'], old['p50']):>8}   p95 {change(summary['p95'], old['p95']):>8}")
+    old_levels = {level["clients"]: level for level in baseline["concurrency"]}
+    for level in report["concurrency"]:
+        old = old_levels.get(level["clients"])
+        if old:
+            print(f"  {level['clients']:>3} clients  throughput {change(level['throughput_rps'], old['throughput_rps']):>8}"
+                  f"   p95 {change(level['latency_ms']['p95'], old['latency_ms']['p95']):>8}")
+    print(f"  peak RSS     {change(report['peak_rss_mb'], baseline['peak_rss_mb']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--gallery", default=config.EMBEDDINGS_PATH)
+    parser.add_argument("--limit", type=int, default=100, help="Dataset images to use (0 = all)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=1, help="Passes over the images per concurrency level")
+    parser.add_argument("--target", type=int, default=config.DECODE_TARGET_SIZE, help="Decode target size")
+    parser.add_argument("--sr-min-face", type=int, default=config.SR_MIN_FACE_SIZE,
+                        help="Adaptive SR threshold (0 = full-frame SR)")
+    parser.add_argument("--no-sr", action="store_true", help="Disable super-resolution")
+    parser.add_argument("--enhance", action="store_true", help="Run enhance_image() on each frame first")
+    parser.add_argument("--batching", action="store_true", help="Send concurrent requests through a MicroBatcher")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    uploads = load_uploads(args.dataset, args.limit)
+    if not uploads:
+        raise SystemExit(f"No images found in {args.dataset}")
+
+    with RssSampler() as sampler:
+        set_backend(num_threads=config.ONNX_THREADS, **config.inference_backend_options())
+        pipeline = RecognitionPipeline(load_gallery(args.gallery, config.GALLERY_INDEX, **config.gallery_index_params()),
+                                       apply_sr=not args.no_sr, sr_min_face=args.sr_min_face)
+
+        start = time.perf_counter()
+        registry.warmup()
+        warmup_s = time.perf_counter() - start
+        baseline_rss = sampler.peak_mb
+
+        print(f"{len(uploads)} images, backend {config.INFERENCE_BACKEND}, models ready in {warmup_s:.1f}s")
+        stages, accuracy = stage_breakdown(pipeline, uploads, args)
+        levels = [concurrency_level(pipeline, uploads, args, clients, sampler) for clients in args.concurrency]
+        peak_rss = max([baseline_rss] + [level["peak_rss_mb"] for level in levels])
+
+    print(f"\n{'stage':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}   (ms, sequential)")
+    for stage, summary in stages.items():
+        print(f"{stage:<12}{summary['p50']:>9.2f}{summary['p95']:>9.2f}{summary['p99']:>9.2f}{summary['mean']:>9.2f}")
+    print(f"accuracy {accuracy:.2%}")
+
+    print(f"\n{'clients':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak MB':>9}")
+    for level in levels:
+        latency = level["latency_ms"]
+        print(f"{level['clients']:>7}{level['throughput_rps']:>9.2f}{latency['p50']:>9.2f}{latency['p95']:>9.2f}"
+              f"{latency['p99']:>9.2f}{level['peak_rss_mb']:>9.1f}")
+    print(f"peak RSS {peak_rss:.1f} MB (after model load {baseline_rss:.1f} MB)")
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {
+            "images": len(uploads),
+            "backend": config.INFERENCE_BACKEND,
+            "precision": config.EMBEDDER_PRECISION,
+            "decode_target": args.target,
+            "super_resolution": not args.no_sr,
+            "sr_min_face": args.sr_min_face,
+            "enhance": args.enhance,
+            "batching": args.batching,
+            "gallery_index": config.GALLERY_INDEX,
+        },
+        "warmup_s": round(warmup_s, 2),
+        "accuracy": round(accuracy, 4),
+        "stages": stages,
+        "concurrency": levels,
+        "model_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of enhance_image() per lighting branch
+
+Compares the previous step-by-step pipeline (new LUT and CLAHE per call,
+separate LAB / YCrCb round trips, bilateral filter on all three channels)
+against the fused single-colour-space LumaEnhancer, on the full frame and on
+a face-sized ROI.
+
+Usage (from Backend/):
+    python -m benchmarks.enhancement
+    python -m benchmarks.enhancement --width 1920 --height 1080 --repeats 20 --output enhance.json
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from services.manifest import scan_dataset
+from services.preprocessing import enhance_image, lighting_branch
+
+# (gain, offset) that push the source image into each branch
+BRANCH_LEVELS = {"dark": (0.3, 0), "normal": (1.0, 0), "bright": (1.2, 120)}
+
+
+# Previous implementation, kept here as the baseline
+def _legacy_gamma(image, gamma):
+    inv_gamma = 1.0 / gamma
+    table = np.array([(i / 255.0) ** inv_gamma * 255 for i in np.arange(256)]).astype("uint8")
+    return cv2.LUT(image, table)
+
+
+def _legacy_clahe(image):
+    lab = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return cv2.cvtColor(cv2.merge((clahe.apply(l), a, b)), cv2.COLOR_LAB2RGB)
+
+
+def _legacy_hist_eq(image):
+    y, cr, cb = cv2.split(cv2.cvtColor(image, cv2.COLOR_RGB2YCrCb))
+    return cv2.cvtColor(cv2.merge((cv2.equalizeHist(y), cr, cb)), cv2.COLOR_YCrCb2RGB)
+
+
+def _legacy_sharpen(image):
+    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+    return cv2.filter2D(image, -1, kernel)
+
+
+def _legacy_denoise(image):
+    return cv2.bilateralFilter(image, d=7, sigmaColor=50, sigmaSpace=50)
+
+
+def legacy_enhance(image):
+    brightness = np.mean(image)
+    if brightness < 80:
+        image = _legacy_gamma(image, 2.5)
+        image = _legacy_clahe(image)
+        image = _legacy_hist_eq(image)
+        image = _legacy_sharpen(image)
+        return _legacy_denoise(image)
+    if brightness > 200:
+        image = _legacy_gamma(image, 0.8)
+        image = _legacy_clahe(image)
+        return _legacy_denoise(image)
+    image = _legacy_gamma(image, 1.5)
+    image = _legacy_clahe(image)
+    image = _legacy_sharpen(image)
+    return _legacy_denoise(image)
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Source image (default: first dataset image)")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    path = args.image or sorted(scan_dataset(args.dataset)[1])[0][2]
+    source = cv2.imread(path)
+    if source is None:
+        raise SystemExit(f"Could not read {path}")
+    source = cv2.cvtColor(cv2.resize(source, (args.width, args.height)), cv2.COLOR_BGR2RGB)
+
+    # A face-sized box in the middle of the frame
+    roi = (args.width * 3 // 8, args.height // 4, args.width * 5 // 8, args.height * 3 // 4)
+
+    results = []
+    for branch, (gain, offset) in BRANCH_LEVELS.items():
+        image = cv2.convertScaleAbs(source, alpha=gain, beta=offset)
+        if lighting_branch(image) != branch:
+            print(f"Warning: level ({gain}, {offset}) selects the '{lighting_branch(image)}' branch, not '{branch}'")
+
+        legacy_ms = best_of(lambda: legacy_enhance(image), args.repeats)
+        fused_ms = best_of(lambda: enhance_image(image), args.repeats)
+        roi_ms = best_of(lambda: enhance_image(image, roi=roi), args.repeats)
+        results.append({
+            "branch": branch,
+            "legacy_ms": round(legacy_ms, 2),
+            "fused_ms": round(fused_ms, 2),
+            "fused_roi_ms": round(roi_ms, 2),
+            "speedup": round(legacy_ms / fused_ms, 2),
+            "roi_speedup": round(legacy_ms / roi_ms, 2),
+        })
+
+    print(f"{args.width}x{args.height} frame, ROI {roi}")
+    print(f"{'branch':<8}{'legacy ms':>11}{'fused ms':>10}{'ROI ms':>9}{'speedup':>9}{'ROI speedup':>13}")
+    for row in results:
+        print(f"{row['branch']:<8}{row['legacy_ms']:>11.2f}{row['fused_ms']:>10.2f}{row['fused_roi_ms']:>9.2f}"
+              f"{row['speedup']:>8.2f}x{row['roi_speedup']:>12.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"frame": [args.width, args.height], "roi": roi, "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Detector and embedder latency: PyTorch vs ONNX Runtime
+
+Run `python -m services.onnx_backend export` first.
+
+Usage (from Backend/):
+    python -m benchmarks.inference_backends
+    python -m benchmarks.inference_backends --threads 4 --batch-sizes 1 8 32 --output backends.json
+"""
+import argparse
+import json
+import time
+import cv2
+from services.manifest import scan_dataset
+
+
+def best_of(fn, repeats):
+    """Fastest of several runs (ms) after one untimed warm-up run"""
+    fn()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def torch_models(threads):
+    import torch
+    from facenet_pytorch import InceptionResnetV1
+    from ultralytics import YOLO
+    from services.model_registry import YOLO_FACE_PATH, face_transform
+    from PIL import Image
+
+    if threads:
+        torch.set_num_threads(threads)
+    detector = YOLO(YOLO_FACE_PATH)
+    facenet = InceptionResnetV1(pretrained='vggface2').eval()
+    transform = face_transform()
+
+    def embed(faces):
+        batch = torch.stack([transform(Image.fromarray(face)) for face in faces])
+        with torch.no_grad():
+            return facenet(batch).numpy()
+
+    return lambda frames: detector.predict(frames, conf=0.2, verbose=False), embed
+
+
+def onnx_models(threads):
+    from services.onnx_backend import OnnxEmbedder, OnnxFaceDetector
+
+    detector = OnnxFaceDetector(num_threads=threads)
+    embedder = OnnxEmbedder(num_threads=threads)
+    return lambda frames: detector.predict(frames, conf=0.2), embedder.embed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--threads", type=int, default=0, help="Threads per backend (0 = library default)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--frame-size", type=int, nargs=2, default=[1280, 720], metavar=("W", "H"))
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    items = sorted(scan_dataset(args.dataset)[1])[:max(args.batch_sizes)]
+    images = [cv2.imread(path) for _, _, path in items]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No images found in {args.dataset}")
+
+    # Detector input: dataset images scaled to a camera-sized frame;
+    # embedder input: the dataset images themselves (already face crops)
+    frames = [cv2.resize(image, tuple(args.frame_size)) for image in images]
+    faces = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in images]
+
+    results = []
+    for name, factory in (("torch", torch_models), ("onnx", onnx_models)):
+        detect, embed = factory(args.threads)
+        for batch_size in args.batch_sizes:
+            detect_ms = best_of(lambda: detect(frames[:batch_size]), args.repeats)
+            embed_ms = best_of(lambda: embed(faces[:batch_size]), args.repeats)
+            results.append({
+                "backend": name,
+                "batch_size": batch_size,
+                "detect_ms_per_frame": round(detect_ms / batch_size, 2),
+                "embed_ms_per_face": round(embed_ms / batch_size, 2),
+            })
+
+    print(f"{'backend':<9}{'batch':>7}{'detect ms/frame':>17}{'embed ms/face':>15}")
+    for row in results:
+        print(f"{row['backend']:<9}{row['batch_size']:>7}{row['detect_ms_per_frame']:>17.2f}"
+              f"{row['embed_ms_per_face']:>15.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"threads": args.threads, "frame_size": args.frame_size, "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
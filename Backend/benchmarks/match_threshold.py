@@ -0,0 +1,139 @@
+"""
+Match decisions of EmbeddingGallery against the original dict matcher
+
+The original predict_face compared the query embedding with the stored
+per-identity means as they are; EmbeddingGallery L2-normalises the means
+first. A mean of several unit embeddings is shorter than 1, so for identities
+enrolled from more than one image the genuine distance grows
+(||q - m|| -> ||q - m / |m|||) and decisions at the same threshold can change.
+Identities enrolled from one image are unaffected.
+
+The stored report needs no model: probes are the stored single-image
+identities (each one a real embedding) matched against everyone else, and
+the mean genuine distance of an enrolled image follows from |m| alone
+(old sqrt(1 - |m|^2), new sqrt(2 - 2|m|)). --dataset additionally embeds
+every dataset image with the registry's FaceNet and compares both matchers.
+
+Usage (from Backend/):
+    python -m benchmarks.match_threshold
+    python -m benchmarks.match_threshold --dataset dataset --thresholds 0.7 0.8 0.9
+"""
+import argparse
+import json
+import pickle
+import numpy as np
+from services.gallery import EmbeddingGallery
+
+# |m| above this is treated as a single-image identity (unit embedding)
+UNIT_NORM = 0.999
+
+
+def legacy_match(queries, embeddings_dict, threshold):
+    """The original predict_face: Euclidean distance to the raw stored means"""
+    labels = list(embeddings_dict.keys())
+    means = np.stack([np.asarray(embeddings_dict[name], dtype=np.float32) for name in labels])
+    identities, distances = [], []
+    for query in np.atleast_2d(queries):
+        dists = np.linalg.norm(means - query, axis=1)
+        best = int(np.argmin(dists))
+        identities.append(labels[best] if dists[best] < threshold else "Unknown")
+        distances.append(float(dists[best]))
+    return identities, distances
+
+
+def stored_report(embeddings_dict, thresholds):
+    """Genuine distance shift of averaged identities and impostor accepts of single-image probes"""
+    norms = {name: float(np.linalg.norm(emb)) for name, emb in embeddings_dict.items()}
+    averaged = {name: norm for name, norm in norms.items() if norm < UNIT_NORM}
+    genuine = [{
+        "identity": name,
+        "norm": round(norm, 4),
+        "old_distance": round(float(np.sqrt(max(1.0 - norm ** 2, 0.0))), 4),
+        "new_distance": round(float(np.sqrt(max(2.0 - 2.0 * norm, 0.0))), 4),
+    } for name, norm in sorted(averaged.items())]
+
+    # Each single-image identity probes a gallery without itself: any match
+    # is a false accept
+    probes = [name for name, norm in norms.items() if norm >= UNIT_NORM]
+    impostors = []
+    for threshold in thresholds:
+        old_accepts = new_accepts = 0
+        for name in probes:
+            others = {other: emb for other, emb in embeddings_dict.items() if other != name}
+            query = np.asarray(embeddings_dict[name], dtype=np.float32)
+            old_accepts += legacy_match(query, others, threshold)[0][0] != "Unknown"
+            new_accepts += EmbeddingGallery.from_dict(others).match(query, threshold=threshold)[0][0] != "Unknown"
+        impostors.append({"threshold": threshold, "probes": len(probes),
+                          "old_false_accepts": int(old_accepts), "new_false_accepts": int(new_accepts)})
+    return {"identities": len(norms), "averaged": genuine, "impostors": impostors}
+
+
+def dataset_report(embeddings_dict, dataset_path, thresholds, limit):
+    """Accuracy of both matchers on freshly embedded dataset faces"""
+    from services.quantization import dataset_faces
+    from services.recognition import embed_faces
+
+    faces, labels = dataset_faces(dataset_path, limit)
+    if not faces:
+        raise ValueError(f"No faces found in {dataset_path}")
+    embeddings = embed_faces(faces)
+    gallery = EmbeddingGallery.from_dict(embeddings_dict)
+    expected = [label if label in embeddings_dict else "Unknown" for label in labels]
+
+    rows = []
+    for threshold in thresholds:
+        old_ids, old_dists = legacy_match(embeddings, embeddings_dict, threshold)
+        new_ids, new_dists = gallery.match(embeddings, threshold=threshold)
+        genuine = [i for i, label in enumerate(labels) if label in embeddings_dict]
+        rows.append({
+            "threshold": threshold,
+            "faces": len(faces),
+            "old_accuracy": round(float(np.mean([a == b for a, b in zip(old_ids, expected)])), 4),
+            "new_accuracy": round(float(np.mean([a == b for a, b in zip(new_ids, expected)])), 4),
+            "agreement": round(float(np.mean([a == b for a, b in zip(old_ids, new_ids)])), 4),
+            "old_mean_distance": round(float(np.mean([old_dists[i] for i in genuine])), 4) if genuine else None,
+            "new_mean_distance": round(float(np.mean([new_dists[i] for i in genuine])), 4) if genuine else None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="assets/embeddings.pkl")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8])
+    parser.add_argument("--dataset", help="Also embed and match every image of this dataset folder")
+    parser.add_argument("--limit", type=int, default=0, help="Dataset images (0 = all)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with open(args.embeddings, "rb") as f:
+        embeddings_dict = pickle.load(f)
+
+    stored = stored_report(embeddings_dict, args.thresholds)
+    print(f"Gallery: {stored['identities']} identities, {len(stored['averaged'])} enrolled from several images")
+    print(f"{'averaged identity':<28}{'|m|':>8}{'old dist':>10}{'new dist':>10}")
+    for row in stored["averaged"]:
+        print(f"{row['identity']:<28}{row['norm']:>8.4f}{row['old_distance']:>10.4f}{row['new_distance']:>10.4f}")
+    print(f"{'threshold':<12}{'probes':>8}{'old FA':>8}{'new FA':>8}")
+    for row in stored["impostors"]:
+        print(f"{row['threshold']:<12}{row['probes']:>8}{row['old_false_accepts']:>8}{row['new_false_accepts']:>8}")
+    results = {"stored": stored}
+
+    if args.dataset:
+        rows = dataset_report(embeddings_dict, args.dataset, args.thresholds, args.limit)
+        print(f"{'threshold':<12}{'faces':>7}{'old acc':>9}{'new acc':>9}{'agree':>8}"
+              f"{'old dist':>10}{'new dist':>10}")
+        for row in rows:
+            print(f"{row['threshold']:<12}{row['faces']:>7}{row['old_accuracy']:>9.4f}{row['new_accuracy']:>9.4f}"
+                  f"{row['agreement']:>8.4f}{row['old_mean_distance'] or 0:>10.4f}"
+                  f"{row['new_mean_distance'] or 0:>10.4f}")
+        results["dataset"] = rows
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
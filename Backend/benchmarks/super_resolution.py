@@ -0,0 +1,116 @@
+"""
+Latency and detection recall of the super-resolution colour modes
+
+Compares the single-pass 'luma' mode against the three-pass 'per_channel'
+mode on dataset images, optionally downscaled first to mimic the small,
+distant faces super-resolution is meant for.
+
+Usage (from Backend/):
+    python -m benchmarks.super_resolution                   # dataset/, 200 images
+    python -m benchmarks.super_resolution --downscale 3 --limit 500
+    python -m benchmarks.super_resolution --no-detect --output sr.json
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from services.manifest import scan_dataset
+from services.super_resolution import SR_MODES, SuperResolution
+
+
+def load_frames(dataset_path, limit, downscale):
+    """BGR frames from the dataset, shrunk by the downscale factor"""
+    _, items = scan_dataset(dataset_path)
+    frames = []
+    for _, _, path in sorted(items)[:limit]:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        if downscale > 1:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (max(1, w // downscale), max(1, h // downscale)),
+                               interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+    return frames
+
+
+def time_mode(sr_model, frames, mode, repeats):
+    """Per-frame upsample latencies (ms) and the outputs of the last run"""
+    latencies = []
+    outputs = []
+    for frame in frames:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = sr_model.upsample(frame, mode=mode)
+            best = min(best, (time.perf_counter() - start) * 1000)
+        latencies.append(best)
+        outputs.append(output)
+    return np.array(latencies), outputs
+
+
+def detect(frames, batch_size=16):
+    """Whether YOLO finds a face in each frame (same settings as the API)"""
+    from services.detection import yolo_model
+
+    found = []
+    for i in range(0, len(frames), batch_size):
+        results = yolo_model.predict(frames[i:i + batch_size], conf=0.2, verbose=False)
+        found.extend(len(result.boxes) > 0 for result in results)
+    return np.array(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--limit", type=int, default=200, help="Number of images to use")
+    parser.add_argument("--downscale", type=int, default=2, help="Shrink inputs by this factor first")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per image (best is kept)")
+    parser.add_argument("--no-detect", action="store_true", help="Skip the YOLO recall comparison")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    frames = load_frames(args.dataset, args.limit, args.downscale)
+    if not frames:
+        raise SystemExit(f"No images found in {args.dataset}")
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames (first {w}x{h}), {args.repeats} repeats")
+
+    sr_model = SuperResolution(model_name="espcn", scale=2)
+
+    results = []
+    outputs = {}
+    for mode in SR_MODES:
+        latencies, outputs[mode] = time_mode(sr_model, frames, mode, args.repeats)
+        results.append({
+            "mode": mode,
+            "mean_ms": round(float(latencies.mean()), 3),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        })
+
+    # How far the luma output strays from the three-pass output
+    psnr = np.mean([cv2.PSNR(a, b) for a, b in zip(outputs["luma"], outputs["per_channel"])])
+
+    if not args.no_detect:
+        for row in results:
+            found = detect(outputs[row["mode"]])
+            row["detection_recall"] = round(float(found.mean()), 4)
+
+    print(f"{'mode':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}")
+    for row in results:
+        recall = row.get("detection_recall")
+        print(f"{row['mode']:<14}{row['mean_ms']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{'-' if recall is None else f'{recall:.4f}':>10}")
+    print(f"PSNR luma vs per_channel: {psnr:.2f} dB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"frames": len(frames), "downscale": args.downscale,
+                       "psnr_luma_vs_per_channel": round(float(psnr), 2), "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Path to the enrolled face embeddings: a memory-mapped .gallery file
+# (preferred) or a pickled {name: embedding} dict
+# Matching uses L2-normalised per-identity means; for people enrolled from
+# several images this puts genuine matches slightly further away than the
+# original raw-mean distance, so check recall at the 0.8 match threshold with
+# python -m benchmarks.match_threshold --dataset dataset after enrolling.
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "assets/embeddings.gallery")
+
+# Seconds between checks of EMBEDDINGS_PATH for changes; a changed file is
+# loaded in the background and swapped in atomically. 0 disables watching
+# (POST /admin/gallery/reload still works).
+GALLERY_POLL_INTERVAL = float(os.getenv("GALLERY_POLL_INTERVAL", "5"))
+
+# Dataset folder (one sub-folder of images per employee); faces enrolled via
+# POST /employees/{id}/faces are saved here as well
+DATASET_PATH = os.getenv("DATASET_PATH", "dataset")
+
+# Frames saved with attendance records logged by /recognize/multi
+UPLOADS_PATH = os.getenv("UPLOADS_PATH", "uploads")
+
+# Collapsed-stack files written by the admin-triggered sampling profiler
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Nearest-neighbour index used by the embedding gallery: "exact" or "ivf"
+GALLERY_INDEX = os.getenv("GALLERY_INDEX", "exact")
+
+# IVF knobs: number of buckets (0 = sqrt of gallery size) and buckets probed
+# per query. Raising IVF_NPROBE trades latency for recall.
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+
+# Shared secret for /admin endpoints, sent as the X-Admin-Token header.
+# Admin endpoints are disabled when unset.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def gallery_index_params():
+    """Index options for the configured GALLERY_INDEX backend"""
+    if GALLERY_INDEX == "ivf":
+        return {"nlist": IVF_NLIST, "nprobe": IVF_NPROBE}
+    return {}
+
+# Uploaded JPEGs are decoded at 1/2, 1/4 or 1/8 resolution when their longer
+# side stays at least DECODE_TARGET_SIZE pixels (the detector's input size).
+# 0 always decodes at full resolution.
+DECODE_TARGET_SIZE = int(os.getenv("DECODE_TARGET_SIZE", "640"))
+
+# Adaptive super-resolution: YOLO runs on the native frame and only face crops
+# whose shorter side is below SR_MIN_FACE_SIZE pixels (or frames with no
+# detection) are super-resolved. 0 super-resolves every frame before detection.
+SR_MIN_FACE_SIZE = int(os.getenv("SR_MIN_FACE_SIZE", "80"))
+
+# Micro-batching of concurrent /recognize requests: frames are collected for
+# up to RECOGNIZE_BATCH_SIZE items or RECOGNIZE_BATCH_WAIT_MS milliseconds
+# and run through one batched YOLO and FaceNet forward pass
+RECOGNIZE_BATCHING = os.getenv("RECOGNIZE_BATCHING", "false").lower() in ("1", "true", "yes")
+RECOGNIZE_BATCH_SIZE = int(os.getenv("RECOGNIZE_BATCH_SIZE", "8"))
+RECOGNIZE_BATCH_WAIT_MS = float(os.getenv("RECOGNIZE_BATCH_WAIT_MS", "10"))
+
+# Bounded executor that runs decode + inference off the event loop.
+# INFERENCE_POOL_SIZE jobs run at once and INFERENCE_MAX_QUEUE more may wait;
+# further requests get 503. With batching enabled the pool size should be at
+# least RECOGNIZE_BATCH_SIZE so batches can fill.
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "2"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "16"))
+
+# Dedicated inference processes. 0 runs the models inside each API process;
+# N > 0 starts N worker processes that each own one model set and receive
+# decoded frames through shared memory. INFERENCE_WORKER_THREADS sets the
+# torch/OpenCV threads per worker (0 = split the cores evenly).
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "0"))
+
+# Models load lazily on first use. MODEL_WARMUP loads them and runs one dummy
+# inference at startup (in each worker process when INFERENCE_WORKERS > 0),
+# trading a slower start for a fast first request.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "false").lower() in ("1", "true", "yes")
+
+# Runtime for the detector and embedder: "torch" or "onnx" (ONNX Runtime with
+# full graph optimisations; export the models first with
+# python -m services.onnx_backend export). ONNX_THREADS sets ONNX Runtime's
+# intra-op threads in the API process (0 = all cores); inference workers use
+# INFERENCE_WORKER_THREADS instead.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# FaceNet precision with the onnx backend: "fp32" or "int8" (build it with
+# python -m services.quantization calibrate / evaluate). An INT8 model is only
+# used if its evaluation report shows a match-accuracy drop of at most
+# QUANT_MAX_ACCURACY_DROP (fraction) at the 0.8 threshold; otherwise fp32 is used.
+EMBEDDER_PRECISION = os.getenv("EMBEDDER_PRECISION", "fp32")
+QUANT_MAX_ACCURACY_DROP = float(os.getenv("QUANT_MAX_ACCURACY_DROP", "0.01"))
+
+
+def inference_backend_options():
+    """Model registry backend options (see services.model_registry.set_backend)"""
+    return {"name": INFERENCE_BACKEND, "precision": EMBEDDER_PRECISION,
+            "max_accuracy_drop": QUANT_MAX_ACCURACY_DROP}
+
+# Recognition result cache keyed by the sha256 of the upload bytes, so resent
+# frames (retries, double key presses) skip inference. Entries expire after
+# RESULT_CACHE_TTL seconds and the whole cache is cleared when the gallery
+# changes. RESULT_CACHE_SIZE=0 disables it.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "30"))
+
+# Optional second level for near-identical frames: face crops of about the
+# same size whose perceptual hash is within FACE_CACHE_MAX_DISTANCE bits of a
+# recent crop reuse its embedding (detection still runs). FACE_CACHE_SIZE=0
+# disables it. A 64-bit hash cannot tell similar-looking people apart, so a
+# larger radius risks reporting the wrong person; keep it at 0 (identical
+# hash) or 1.
+FACE_CACHE_SIZE = int(os.getenv("FACE_CACHE_SIZE", "0"))
+FACE_CACHE_MAX_DISTANCE = int(os.getenv("FACE_CACHE_MAX_DISTANCE", "1"))
+
+
+def face_cache_options():
+    """FaceEmbeddingCache options, or None when the face cache is disabled"""
+    if FACE_CACHE_SIZE <= 0:
+        return None
+    return {"max_entries": FACE_CACHE_SIZE, "ttl": RESULT_CACHE_TTL, "max_distance": FACE_CACHE_MAX_DISTANCE}
+
+# WebSocket stream mode (/recognize/stream): the detector runs on every
+# STREAM_DETECT_EVERY-th frame and faces are tracked in between. A tracked face
+# is embedded once and again only when a crop scores STREAM_REEMBED_GAIN times
+# better on size/sharpness. Needs in-process inference (INFERENCE_WORKERS=0).
+STREAM_DETECT_EVERY = int(os.getenv("STREAM_DETECT_EVERY", "5"))
+STREAM_REEMBED_GAIN = float(os.getenv("STREAM_REEMBED_GAIN", "1.25"))
+
+# Bulk recognition (/recognize/bulk): images per batched detection / embedding
+# call, decoder threads, and how many bulk jobs may run at once (further
+# requests get 503). Bulk batches run on the inference executor only when a
+# worker is idle, so backfills cannot starve live recognition.
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "16"))
+BULK_DECODE_WORKERS = int(os.getenv("BULK_DECODE_WORKERS", "4"))
+BULK_MAX_JOBS = int(os.getenv("BULK_MAX_JOBS", "1"))
@@ -4,7 +4,13 @@ from models import Employee, Attendance
 import schema
 from typing import Optional
 from datetime import datetime, date
+from services import metrics
 
+def _timed(fn):
+    # Query timings, exported on /metrics as db_<function>_ms
+    return metrics.timed(f"db_{fn.__name__}", f"crud.{fn.__name__} duration (ms)")(fn)
+
+@_timed
 def create_employee(db: Session, employee: schema.EmployeeCreate):
     db_employee = Employee(name=employee.name, email=employee.email)
     db.add(db_employee)
@@ -12,12 +18,15 @@ def create_employee(db: Session, employee: schema.EmployeeCreate):
     db.refresh(db_employee)
     return db_employee
 
+@_timed
 def get_employee(db: Session, employee_id: int):
     return db.query(Employee).filter(Employee.id == employee_id).first()
 
+@_timed
 def get_all_employees(db: Session):
     return db.query(Employee).all()
 
+@_timed
 def create_attendance(db: Session, employee_id: int, employee_name: str, image_path: str):
     db_attendance = Attendance(employee_id=employee_id, employee_name=employee_name, image_path=image_path)
     db.add(db_attendance)
@@ -25,6 +34,19 @@ def create_attendance(db: Session, employee_id: int, employee_name: str, image_p
     db.refresh(db_attendance)
     return db_attendance
 
+@_timed
+def create_attendances(db: Session, records):
+    # Insert several (employee_id, employee_name, image_path) records in one transaction
+    db_attendances = [Attendance(employee_id=employee_id, employee_name=employee_name, image_path=image_path)
+                      for employee_id, employee_name, image_path in records]
+    db.add_all(db_attendances)
+    db.flush()
+    ids = [attendance.id for attendance in db_attendances]
+    db.commit()
+    # One query for the server-generated fields instead of a refresh per row
+    return db.query(Attendance).filter(Attendance.id.in_(ids)).order_by(Attendance.id).all()
+
+@_timed
 def get_attendance_by_date(db: Session, date_str: str):
     # Convert the string to a date object; expect "YYYY-MM-DD" format
     try:
@@ -36,11 +58,13 @@ def get_attendance_by_date(db: Session, date_str: str):
     end_of_day = datetime.combine(date_obj, datetime.max.time())
     return db.query(Attendance).filter(Attendance.time_in.between(start_of_day, end_of_day)).all()
 
+@_timed
 def get_employee_attendance(db: Session, employee_id: int):
     return db.query(Attendance).filter(
         Attendance.employee_id == employee_id
     ).order_by(Attendance.time_in.desc()).all()
 
+@_timed
 def get_employee_attendance_with_filters(
     db: Session, 
     employee_id: int, 
@@ -63,9 +87,11 @@ def get_employee_attendance_with_filters(
     
     return query.order_by(Attendance.time_in.desc()).offset(skip).limit(limit).all()
 
+@_timed
 def get_attendance(db: Session, attendance_id: int):
     return db.query(Attendance).filter(Attendance.id == attendance_id).first()
 
+@_timed
 def delete_attendance(db: Session, attendance_id: int):
     db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
     if db_attendance:
@@ -73,6 +99,7 @@ def delete_attendance(db: Session, attendance_id: int):
         db.commit()
     return db_attendance
 
+@_timed
 def get_monthly_attendance_stats(db: Session, year: int, month: int):
     # Count total attendance for the month
     total_count = db.query(func.count(Attendance.id)).filter(
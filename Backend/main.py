@@ -1,7 +1,10 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from routes import attendance, employees, recognize  # Ensure naming is consistent!
-import database, models
+from fastapi.responses import PlainTextResponse
+from routes import attendance, employees, recognize, admin  # Ensure naming is consistent!
+from services import metrics
+import config, database, models
 
 # Create database tables (if not already created)
 database.Base.metadata.create_all(bind=database.engine)
@@ -24,6 +27,21 @@ app.add_middleware(
 app.include_router(employees.router)
 app.include_router(attendance.router)
 app.include_router(recognize.router)
+app.include_router(admin.router)
+
+@app.on_event("startup")
+async def warmup_models():
+    # Models otherwise load on the first recognition request
+    if config.MODEL_WARMUP:
+        await run_in_threadpool(recognize.warmup)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Stage / DB timings and counters in Prometheus text format. With
+    # INFERENCE_WORKERS > 0 the model stages run in the workers; their latest
+    # snapshots are summed with this process's metrics
+    return PlainTextResponse(metrics.render_prometheus(recognize.worker_metrics()),
+                             media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
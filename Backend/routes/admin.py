@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+import os
+import secrets
+import config
+from routes import recognize
+from services.profiler import ProfilerBusy
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Allow the request only if it carries the configured admin token.
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.post("/gallery/reload")
+def reload_gallery():
+    """
+    Reload the embedding gallery from disk without restarting the API.
+
+    In-process, the new gallery and its index are built during this request
+    and swapped in atomically once ready; recognitions keep using the
+    previous one until then. With inference workers the reload is only
+    scheduled and happens on each worker's next gallery poll.
+    """
+    manager = recognize.gallery_manager
+    if manager is None:
+        # Galleries live in the inference workers; they rebuild on their next poll
+        recognize.request_reload()
+        return {"status": "scheduled"}
+
+    reloaded = manager.reload(force=True)
+    return {
+        "status": "reloaded" if reloaded else "failed",
+        "identities": len(manager),
+        "generation": manager.generation,
+    }
+
+
+@router.get("/models")
+def model_stats():
+    """
+    Load time, warm-up time and memory of each inference model.
+
+    Models not loaded yet are reported as null. With inference workers the
+    numbers come from one worker process.
+    """
+    return recognize.model_stats()
+
+
+@router.post("/profiler/start")
+def start_profiler(requests: int = 50, seconds: float = 0, interval_ms: float = 5):
+    """
+    Sample where recognition CPU time goes, without a restart.
+
+    Runs for the next `requests` completed /recognize calls or `seconds`,
+    whichever ends first (0 disables a limit). Stacks are sampled every
+    `interval_ms` and written as collapsed stacks for flamegraph tools;
+    fetch them from /admin/profiler/output.
+    """
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    try:
+        return recognize.profiler.start(requests, seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/profiler")
+def profiler_status():
+    """Progress of the running profiling session, or the last output file."""
+    return recognize.profiler.status()
+
+
+@router.post("/profiler/stop")
+def stop_profiler():
+    """End the running profiling session early and write its output."""
+    return recognize.profiler.stop()
+
+
+@router.get("/profiler/output")
+def profiler_output():
+    """
+    Collapsed stacks of the last finished session.
+
+    Render with e.g. `flamegraph.pl recognize.collapsed > recognize.svg`,
+    `inferno-flamegraph`, or by loading the file into speedscope.
+    """
+    path = recognize.profiler.last_output
+    if path is None:
+        raise HTTPException(status_code=404, detail="No profile has been recorded yet.")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
@@ -2,8 +2,6 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 import crud, database, schema
-from services.utils import load_image_from_bytes, preprocess_face
-from services.detection import detect_face
 import pickle
 import os
 from datetime import datetime, date
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db 
@@ -44,3 +45,48 @@ def get_all_employees(db: Session = Depends(get_db)):
     Get a list of all employees.
     """
     return crud.get_all_employees(db)
+
+@router.post("/{employee_id}/faces", status_code=status.HTTP_201_CREATED)
+async def enroll_faces(employee_id: int, files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """
+    Enroll face images for an employee without an offline rebuild.
+
+    Each image is embedded with the already-loaded models, the employee's
+    mean embedding is updated in place and the live gallery starts matching
+    it immediately. Images and embeddings are persisted in the background.
+    """
+    db_employee = crud.get_employee(db, employee_id)
+    if not db_employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    # Imported here so the employee CRUD endpoints do not depend on the models
+    from routes import recognize
+    from services.enrollment import employee_label
+    from services.executor import ExecutorSaturated
+
+    try:
+        label = employee_label(db_employee.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    contents = [await file.read() for file in files]
+    try:
+        results = await recognize.executor.run(recognize.embed_uploads, contents)
+    except ExecutorSaturated:
+        raise HTTPException(status_code=503, detail="Recognition queue is full. Try again shortly.",
+                            headers={"Retry-After": "1"})
+
+    faces = [(file.filename, data, result["embedding"])
+             for file, data, result in zip(files, contents, results) if result is not None]
+    if not faces:
+        raise HTTPException(status_code=400, detail="No face detected in any image.")
+
+    total = await run_in_threadpool(recognize.enroller.add_faces, label, faces)
+
+    return {
+        "employee_id": employee_id,
+        "label": label,
+        "added": len(faces),
+        "skipped": [file.filename for file, result in zip(files, results) if result is None],
+        "total_images": total,
+    }
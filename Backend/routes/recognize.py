@@ -1,50 +1,449 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from services.utils import load_image_from_bytes, preprocess_face
-from services.detection import detect_face
-from services.recognition import get_embedding, predict_face
+from services.utils import decode_upload, scale_box
+from services.batcher import MicroBatcher
+from services.executor import InferenceExecutor, ExecutorSaturated
+from services.enrollment import Enroller, employee_label
+from services.gallery_manager import file_signature
+from services.result_cache import ResultCache, content_key
+from services.stream import StreamSession, streams_active_gauge
+from services.bulk import bulk_recognize, iter_images
+from services.profiler import SamplingProfiler
+from services import metrics
 from database import get_db
 import crud
-import pickle, os
+import config
+import os, time, itertools
 from datetime import datetime
-import schema
-import numpy as np
-import cv2
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List
+import json, shutil, tempfile, threading
 
 router = APIRouter(tags=["Recognition"])
 
-# Load stored embeddings
-try:
-    with open("assets/embeddings.pkl", "rb") as f:
-        stored_embeddings = pickle.load(f)
-except FileNotFoundError:
-    stored_embeddings = {}
+if config.INFERENCE_WORKERS > 0:
+    # Models live in dedicated worker processes; this process only decodes
+    from services.worker_pool import InferenceWorkerPool
+    pipeline = InferenceWorkerPool(config.INFERENCE_WORKERS, config.EMBEDDINGS_PATH,
+                                   config.GALLERY_INDEX, config.gallery_index_params(),
+                                   sr_min_face=config.SR_MIN_FACE_SIZE,
+                                   threads_per_worker=config.INFERENCE_WORKER_THREADS,
+                                   poll_interval=config.GALLERY_POLL_INTERVAL,
+                                   warmup=config.MODEL_WARMUP,
+                                   backend_options=config.inference_backend_options(),
+                                   face_cache_options=config.face_cache_options())
+    gallery_manager = None
+else:
+    from services.gallery_manager import GalleryManager
+    from services.model_registry import set_backend
+    from services.pipeline import RecognitionPipeline
 
-@router.post("/recognize")
-async def recognize_face(file: UploadFile = File(...)):
+    set_backend(num_threads=config.ONNX_THREADS, **config.inference_backend_options())
+
+    # Load stored embeddings; a changed file is picked up without a restart.
+    # The models themselves load on first use (see services.model_registry)
+    gallery_manager = GalleryManager(config.EMBEDDINGS_PATH, config.GALLERY_INDEX,
+                                     config.gallery_index_params(),
+                                     poll_interval=config.GALLERY_POLL_INTERVAL)
+    from services.result_cache import FaceEmbeddingCache
+
+    face_cache_options = config.face_cache_options()
+    pipeline = RecognitionPipeline(gallery_manager, sr_min_face=config.SR_MIN_FACE_SIZE,
+                                   face_cache=FaceEmbeddingCache(**face_cache_options) if face_cache_options else None)
+
+# Results of recently seen uploads, keyed by the sha256 of their bytes.
+# A gallery change can alter any identity, so it empties the cache; with
+# inference workers the key also holds the gallery file's signature, since
+# workers pick up a rebuilt file on their own (see _gallery_version)
+result_cache = None
+if config.RESULT_CACHE_SIZE > 0:
+    result_cache = ResultCache("recognize_cache", config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+    if gallery_manager is not None:
+        gallery_manager.add_listener(lambda gallery: result_cache.clear())
+
+
+def request_reload():
+    """Have the inference workers reload the gallery and drop cached results"""
+    if result_cache is not None:
+        result_cache.clear()
+    pipeline.request_reload()
+
+# Optional dynamic batching of concurrent requests
+batcher = None
+if config.RECOGNIZE_BATCHING:
+    batcher = MicroBatcher(pipeline, config.RECOGNIZE_BATCH_SIZE, config.RECOGNIZE_BATCH_WAIT_MS)
+
+# Decode and inference run here so the event loop stays free for other requests
+executor = InferenceExecutor(config.INFERENCE_POOL_SIZE, config.INFERENCE_MAX_QUEUE)
+
+# Online enrollment: updates the in-process gallery directly, or asks the
+# worker processes to reload once the new embeddings are on disk
+enroller = Enroller(config.EMBEDDINGS_PATH, config.DATASET_PATH, gallery_manager,
+                    on_persist=request_reload if gallery_manager is None else None)
+
+
+# On-demand CPU profiling of recognition requests (toggled from /admin/profiler).
+# Samples threads of this process only, not inference worker processes
+profiler = SamplingProfiler(config.PROFILE_DIR)
+
+
+def warmup():
+    """Load the models (or start the workers) before the first request"""
+    if gallery_manager is None:
+        pipeline.start()
+    else:
+        from services.model_registry import registry
+        registry.warmup()
+
+
+def model_stats():
+    """Load time and memory per model, from this process or a worker"""
+    if gallery_manager is None:
+        return pipeline.model_stats()
+    from services.model_registry import registry
+    return {"pid": os.getpid(), "models": registry.stats()}
+
+
+def worker_metrics():
+    """Latest metric snapshots of the inference workers (none in-process)"""
+    return pipeline.worker_metrics() if gallery_manager is None else []
+
+
+def _gallery_version():
+    """Signature of the gallery file the workers load, or None in-process"""
+    return file_signature(config.EMBEDDINGS_PATH) if gallery_manager is None else None
+
+
+def _recognize_bytes(contents):
+    """Decode and recognize an upload; runs on an executor thread"""
+    if result_cache is not None:
+        start = time.perf_counter()
+        generation = result_cache.generation
+        version = _gallery_version()
+        key = (content_key(contents), version)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True, timings={"cache_ms": (time.perf_counter() - start) * 1000})
+
+    image, timings = decode_upload(contents, config.DECODE_TARGET_SIZE)
+    if image is None:
+        return None
+    if batcher is not None:
+        result = batcher.submit(image, timings).result()
+    else:
+        result = pipeline.run(image, timings)
+
+    # Boxes come back in the (possibly reduced) decoded frame's coordinates
+    result["box"] = scale_box(result["box"], timings["decode_scale"])
+    result["cached"] = False
+    # A worker that has not reloaded the changed file yet reports the old
+    # signature; its result must not be cached under the new one
+    used_version = result.pop("gallery_signature", None)
+    if result_cache is not None and result["identity"] is not None and used_version == version:
+        result_cache.put(key, {k: result[k] for k in ("identity", "distance", "box")}, generation)
+    return result
+
+
+def _recognize_multi_bytes(contents):
+    """Decode an upload and recognize every face in it; runs on an executor thread"""
+    image, timings = decode_upload(contents, config.DECODE_TARGET_SIZE)
+    if image is None:
+        return None
+    result = pipeline.run_multi(image, timings)
+    for face in result["faces"]:
+        face["box"] = scale_box(face["box"], timings["decode_scale"])
+    return result
+
+
+def _log_attendance(db, contents, extension, faces):
+    """
+    Log attendance for every recognised employee in a frame in one transaction
+
+    The frame is saved once under UPLOADS_PATH and shared by the records.
+    Employees are matched by the gallery label their name enrolls under
+    (employee_label), computed forwards from every employee row; labels
+    are never turned back into names.
+
+    Returns:
+        Dict with the 'logged' records, the 'unmatched' identities that have
+        no employee row and the 'ambiguous' ones shared by several employees
+    """
+    labels = {face["identity"] for face in faces if face["identity"] not in (None, "Unknown")}
+    if not labels:
+        return {"logged": [], "unmatched": [], "ambiguous": []}
+
+    employees = {}
+    for employee in crud.get_all_employees(db):
+        try:
+            employees.setdefault(employee_label(employee.name), []).append(employee)
+        except ValueError:
+            # Such a name cannot be a gallery label, so it never matches
+            continue
+    ambiguous = sorted(label for label in labels & employees.keys() if len(employees[label]) > 1)
+    matched = sorted(label for label in labels & employees.keys() if len(employees[label]) == 1)
+    logged = []
+    if matched:
+        os.makedirs(config.UPLOADS_PATH, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        image_path = os.path.join(config.UPLOADS_PATH, f"multi_{timestamp}{extension}")
+        with open(image_path, "wb") as f:
+            f.write(contents)
+
+        records = [(employees[label][0].id, employees[label][0].name, image_path) for label in matched]
+        logged = [{"id": attendance.id, "employee_id": attendance.employee_id,
+                   "employee_name": attendance.employee_name, "time_in": attendance.time_in.isoformat()}
+                  for attendance in crud.create_attendances(db, records)]
+    return {"logged": logged, "unmatched": sorted(labels - employees.keys()), "ambiguous": ambiguous}
+
+
+# Bulk jobs allowed to run at once
+bulk_slots = threading.BoundedSemaphore(max(1, config.BULK_MAX_JOBS))
+
+
+def _spool_uploads(files):
+    """
+    Copy uploads to temporary files owned by the bulk job
+
+    FastAPI closes UploadFiles when the endpoint returns, before a streamed
+    response is produced, so the job keeps its own (disk-backed) copies.
+    """
+    spooled = []
+    for file in files:
+        tmp = tempfile.TemporaryFile()
+        shutil.copyfileobj(file.file, tmp)
+        spooled.append((file.filename or "upload", tmp))
+    return spooled
+
+
+class _BulkJob:
+    def __init__(self, spooled):
+        """A running bulk job: holds a bulk_slots slot and its spooled uploads"""
+        self.spooled = spooled
+        self._lock = threading.Lock()
+        self._released = False
+
+    def lines(self, multi):
+        """NDJSON lines for the job; releases it when done"""
+        try:
+            items = ((name, data) for upload, tmp in self.spooled for name, data in iter_images(upload, tmp))
+            for line in bulk_recognize(items, pipeline, config.BULK_BATCH_SIZE, config.BULK_DECODE_WORKERS,
+                                       config.DECODE_TARGET_SIZE, multi, executor):
+                yield json.dumps(line) + "\n"
+        finally:
+            self.release()
+
+    def release(self):
+        """Close the files and free the slot; safe to call more than once"""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        for _, tmp in self.spooled:
+            tmp.close()
+        bulk_slots.release()
+
+
+# Open WebSocket streams by id, for /recognize/streams
+streams = {}
+_stream_ids = itertools.count(1)
+
+
+def _process_stream_frame(session, contents):
+    """Decode one stream frame and advance the session; runs on an executor thread"""
+    image, timings = decode_upload(contents, config.DECODE_TARGET_SIZE)
+    if image is None:
+        return None, timings
+    faces, stage_timings = session.process(image)
+    for face in faces:
+        face["box"] = scale_box(face["box"], timings["decode_scale"])
+    timings.update(stage_timings)
+    timings["total_ms"] = sum(v for k, v in timings.items() if k.endswith("_ms") and k != "total_ms")
+    return faces, timings
+
+
+def embed_uploads(contents_list):
     """
-    Time Analysis (milliseconds me difference)
+    Detect and embed the largest face in each upload in one batch
+
+    No gallery match or face cache is involved, so each embedding is the
+    upload's own.
+
+    Returns:
+        One entry per upload: its embed_batch() dict, or None if the image
+        could not be decoded or has no face
     """
+    decoded = [decode_upload(contents, config.DECODE_TARGET_SIZE)[0] for contents in contents_list]
+    valid = [i for i, image in enumerate(decoded) if image is not None]
+    results = [None] * len(contents_list)
+    if not valid:
+        return results
+
+    for i, result in zip(valid, pipeline.embed_batch([decoded[i] for i in valid])):
+        if result["embedding"] is not None:
+            results[i] = result
+    return results
 
 
+@router.post("/recognize")
+async def recognize_face(file: UploadFile = File(...)):
+    """
+    Recognize the largest face in the uploaded image.
+
+    Detection runs once; the detected crop is embedded directly and matched
+    against the stored embeddings. Per-stage timings are returned in milliseconds.
+    """
     # Read image bytes
     contents = await file.read()
-    np_img = np.frombuffer(contents, np.uint8)
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
 
-    # Detect face
-    face = detect_face(img)
-    if face is None:
+    try:
+        result = await executor.run(_recognize_bytes, contents)
+    except ExecutorSaturated:
+        raise HTTPException(status_code=503, detail="Recognition queue is full. Try again shortly.",
+                            headers={"Retry-After": "1"})
+    # Only recognitions that ran count towards a profiling session's limit
+    profiler.request_done()
+
+    if result is None:
+        raise HTTPException(status_code=400, detail="Invalid image.")
+    if result["identity"] is None:
         raise HTTPException(status_code=400, detail="No face detected.")
 
-    # Get embedding
-    embedding = get_embedding(face)
+    return JSONResponse(content={
+        "identity": result["identity"],
+        "distance": result["distance"],
+        "box": result["box"],
+        "timings": result["timings"],
+        "cached": result["cached"],
+    })
 
-    # Predict identity
-    identity = predict_face(embedding, stored_embeddings)
 
-    return JSONResponse(content={"identity": identity})
+@router.post("/recognize/multi")
+async def recognize_multi(file: UploadFile = File(...), log_attendance: bool = False, db: Session = Depends(get_db)):
+    """
+    Recognize every face in the uploaded image.
+
+    All detected faces are embedded in one batched forward pass; each is
+    returned with its box, identity and distance, largest first. With
+    log_attendance=true, attendance is recorded for every recognised
+    employee in a single DB transaction.
+    """
+    contents = await file.read()
+
+    try:
+        result = await executor.run(_recognize_multi_bytes, contents)
+    except ExecutorSaturated:
+        raise HTTPException(status_code=503, detail="Recognition queue is full. Try again shortly.",
+                            headers={"Retry-After": "1"})
+    # Only recognitions that ran count towards a profiling session's limit
+    profiler.request_done()
+
+    if result is None:
+        raise HTTPException(status_code=400, detail="Invalid image.")
+
+    response = {"faces": result["faces"], "timings": result["timings"]}
+    if log_attendance:
+        extension = os.path.splitext(file.filename or "")[1].lower() or ".jpg"
+        response["attendance"] = await run_in_threadpool(_log_attendance, db, contents, extension,
+                                                         result["faces"])
+    return JSONResponse(content=response)
+
+
+@router.post("/recognize/bulk")
+async def recognize_bulk(files: List[UploadFile] = File(...), multi: bool = False):
+    """
+    Recognize a batch of stored images, e.g. a day's uploads.
+
+    Accepts any number of images and/or zip or tar(.gz) archives of images.
+    Images are decoded in parallel and recognized in batches; one NDJSON line
+    per image (name, identity, distance, box, timings, or an error) is
+    streamed back as soon as its batch finishes, followed by a summary line.
+    With multi=true every face per image is reported.
+    """
+    if not bulk_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="A bulk job is already running. Try again later.",
+                            headers={"Retry-After": "30"})
+    try:
+        job = _BulkJob(await run_in_threadpool(_spool_uploads, files))
+    except Exception:
+        bulk_slots.release()
+        raise
+
+    # A generator that never starts never runs its finally block (e.g. the
+    # client left before the first chunk), so the response releases the job
+    # once it is done as well
+    try:
+        return StreamingResponse(job.lines(multi), media_type="application/x-ndjson",
+                                 background=BackgroundTask(job.release))
+    except Exception:
+        job.release()
+        raise
+
+
+@router.websocket("/recognize/stream")
+async def recognize_stream(websocket: WebSocket):
+    """
+    Continuous recognition for an always-on camera.
+
+    Send each frame as a binary JPEG/PNG message. Every frame is answered
+    with a JSON message: the faces in view (followed by a tracker between
+    detector runs and embedded only when first seen or clearly better
+    framed), stage timings, and the stream's FPS and inference counts.
+    Frames that arrive while inference is saturated are skipped and
+    answered with "dropped": true.
+    """
+    await websocket.accept()
+    if gallery_manager is None:
+        # Per-stream tracking state cannot follow frames across worker processes
+        await websocket.close(code=1011, reason="Stream mode needs in-process inference (INFERENCE_WORKERS=0)")
+        return
+
+    stream_id = next(_stream_ids)
+    session = streams[stream_id] = StreamSession(pipeline, config.STREAM_DETECT_EVERY,
+                                                 config.STREAM_REEMBED_GAIN)
+    streams_active_gauge.inc()
+    try:
+        while True:
+            contents = await websocket.receive_bytes()
+            try:
+                faces, timings = await executor.run(_process_stream_frame, session, contents)
+            except ExecutorSaturated:
+                session.drop_frame()
+                await websocket.send_json({"stream_id": stream_id, "dropped": True, "stats": session.stats()})
+                continue
+
+            if faces is None:
+                await websocket.send_json({"stream_id": stream_id, "error": "Invalid image."})
+                continue
+            await websocket.send_json({
+                "stream_id": stream_id,
+                "frame": session.frames,
+                "faces": faces,
+                "timings": timings,
+                "stats": session.stats(),
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        del streams[stream_id]
+        streams_active_gauge.dec()
+
+
+@router.get("/recognize/streams")
+def list_streams():
+    """FPS, detector runs and embeddings for each open recognition stream"""
+    return {stream_id: session.stats() for stream_id, session in list(streams.items())}
+
+
+@router.get("/recognize/metrics")
+def recognition_metrics():
+    """
+    Recognition metrics: executor in-flight/rejected counts, batcher queue
+    depth, batch-size and queue-wait histograms, result cache hits/misses.
+    With inference workers, their stage timings and counters are summed in.
+    """
+    return metrics.merge([metrics.snapshot(descriptions=True), *worker_metrics()])
 
 
 # @router.post("/recognize", response_model=schema.AttendanceResponse)
@@ -0,0 +1,92 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from . import metrics
+
+queue_depth = metrics.gauge("recognize_batch_queue_depth", "Frames waiting for the batcher")
+batch_size_hist = metrics.histogram("recognize_batch_size", [1, 2, 4, 8, 16, 32],
+                                    "Frames per batched forward pass")
+queue_wait_hist = metrics.histogram("recognize_batch_queue_wait_ms", [1, 5, 10, 25, 50, 100, 250],
+                                    "Time a frame waited before its batch started")
+
+
+class MicroBatcher:
+    def __init__(self, pipeline, max_batch_size=8, max_wait_ms=10):
+        """
+        Collect concurrent recognition requests into batched forward passes
+
+        A batch is dispatched as soon as it holds max_batch_size frames or
+        the oldest frame has waited max_wait_ms, whichever comes first.
+
+        Args:
+            pipeline: RecognitionPipeline used to run each batch
+            max_batch_size: Maximum frames per batch
+            max_wait_ms: Maximum time the first frame of a batch waits
+        """
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="recognize-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, timings=None):
+        """
+        Queue a BGR frame for recognition
+
+        Returns:
+            concurrent.futures.Future resolving to a RecognitionPipeline.run() dict
+        """
+        future = Future()
+        self._queue.put((image, {} if timings is None else timings, future, time.perf_counter()))
+        queue_depth.set(self._queue.qsize())
+        return future
+
+    async def recognize(self, image, timings=None):
+        """Awaitable wrapper around submit() for async routes"""
+        return await asyncio.wrap_future(self.submit(image, timings))
+
+    def _collect(self):
+        """Block for the first frame, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        queue_depth.set(self._queue.qsize())
+        return batch
+
+    def _loop(self):
+        while True:
+            # A cancelled awaiter cancels its future; running ones can no
+            # longer be cancelled, so set_result() below cannot fail
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, timings, _, queued_at in batch:
+                timings["queue_ms"] = (started - queued_at) * 1000
+                queue_wait_hist.observe(timings["queue_ms"])
+            batch_size_hist.observe(len(batch))
+
+            try:
+                results = self.pipeline.run_batch([image for image, _, _, _ in batch],
+                                                  [timings for _, timings, _, _ in batch])
+            except BaseException as e:
+                # Every future must be resolved or its caller waits forever
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,143 @@
+import math
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from . import metrics
+from .manifest import IMAGE_EXTENSIONS
+from .utils import DETECTOR_INPUT_SIZE, decode_upload, scale_box
+
+bulk_images_counter = metrics.counter("bulk_images_total", "Images processed by bulk recognition")
+bulk_errors_counter = metrics.counter("bulk_errors_total", "Bulk images that could not be decoded")
+
+
+def iter_images(name, fileobj):
+    """
+    Yield (name, bytes) for an uploaded image or every image in an archive
+
+    Zip archives are read through their central directory and tar archives
+    (optionally gzip/bz2/xz compressed) member by member, so only one image
+    is held in memory at a time. Anything else is treated as a single image.
+
+    Args:
+        name: Upload filename; archive members are reported as name/member
+        fileobj: Seekable binary file with the upload
+    """
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield f"{name}/{info.filename}", archive.read(info)
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.ReadError:
+        fileobj.seek(0)
+        yield name, fileobj.read()
+        return
+
+    with archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{name}/{member.name}", archive.extractfile(member).read()
+
+
+def _json_distance(distance):
+    """Distance as a float, or None if there is none (JSON has no inf / NaN)"""
+    if distance is None or not math.isfinite(distance):
+        return None
+    return float(distance)
+
+
+def _result_line(name, result, timings, multi):
+    """JSON-serialisable line for one recognised image"""
+    if multi:
+        for face in result["faces"]:
+            face["box"] = scale_box(face["box"], timings["decode_scale"])
+            face["distance"] = _json_distance(face["distance"])
+        return {"name": name, "faces": result["faces"], "timings": timings}
+    line = {
+        "name": name,
+        "identity": result["identity"],
+        "distance": _json_distance(result["distance"]),
+        "box": scale_box(result["box"], timings["decode_scale"]),
+        "timings": timings,
+    }
+    if result["identity"] is None:
+        line["error"] = "No face detected."
+    return line
+
+
+def bulk_recognize(items, pipeline, batch_size=16, decode_workers=4, target_size=DETECTOR_INPUT_SIZE,
+                   multi=False, executor=None):
+    """
+    Recognize a stream of images in batches, yielding one result per image
+
+    Images are decoded on a thread pool while the previous batch is in
+    detection / embedding, so at most two batches are held in memory
+    regardless of how many images the stream contains.
+
+    Args:
+        items: Iterable of (name, encoded bytes), e.g. from iter_images()
+        pipeline: RecognitionPipeline or InferenceWorkerPool
+        batch_size: Images per batched detection / embedding call
+        decode_workers: Decoder threads
+        target_size: Reduced-resolution decode target (see decode_upload)
+        multi: Report every face per image instead of the largest one
+        executor: Optional InferenceExecutor shared with live requests; each
+            batch then runs on it as low-priority work (run_when_idle)
+
+    Yields:
+        Dicts with the image name and its identity, distance, box and
+        timings ('faces' instead with multi), or an 'error'; finally one
+        {"summary": ...} dict
+    """
+    run_batch = pipeline.run_multi_batch if multi else pipeline.run_batch
+    items = iter(items)
+    counts = {"images": 0, "with_face": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def finish(decoding):
+        frames = [(name, *future.result()) for name, future in decoding]
+        valid = [i for i, (_, image, _) in enumerate(frames) if image is not None]
+        results = []
+        if valid:
+            args = ([frames[i][1] for i in valid], [frames[i][2] for i in valid])
+            results = run_batch(*args) if executor is None else executor.run_when_idle(run_batch, *args)
+        results = dict(zip(valid, results))
+
+        for i, (name, image, timings) in enumerate(frames):
+            counts["images"] += 1
+            if image is None:
+                counts["errors"] += 1
+                bulk_errors_counter.inc()
+                yield {"name": name, "error": "Invalid image."}
+                continue
+            line = _result_line(name, results[i], timings, multi)
+            if line["faces"] if multi else "error" not in line:
+                counts["with_face"] += 1
+            yield line
+        bulk_images_counter.inc(len(frames))
+
+    with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="bulk-decode") as pool:
+        pending = None
+        while True:
+            chunk = list(islice(items, batch_size))
+            if not chunk:
+                break
+            # Start decoding this batch, then run the previous one meanwhile
+            decoding = [(name, pool.submit(decode_upload, data, target_size)) for name, data in chunk]
+            if pending is not None:
+                yield from finish(pending)
+            pending = decoding
+        if pending is not None:
+            yield from finish(pending)
+
+    counts["elapsed_s"] = round(time.perf_counter() - start, 2)
+    counts["images_per_s"] = round(counts["images"] / counts["elapsed_s"], 2) if counts["elapsed_s"] else 0.0
+    yield {"summary": counts}
@@ -1,54 +1,308 @@
 # detection.py
 
-from ultralytics import YOLO
-import os
 import cv2
+import time
 import numpy as np
-from .super_resolution import SuperResolution
+from . import metrics
+from .model_registry import get_model
 
-# Get absolute path to yolov8n-face.pt
-model_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../assets/yolov8n-face.pt"))
-assert os.path.exists(model_path), f"Model file not found at {model_path}"
 
-yolo_model = YOLO(model_path)
-sr_model = SuperResolution(model_name="espcn", scale=2)
+def __getattr__(name):
+    # yolo_model / sr_model used to be created at import; they are now
+    # loaded from the model registry on first access
+    if name == "yolo_model":
+        return get_model("yolo_face")
+    if name == "sr_model":
+        return get_model("super_resolution")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+# Adaptive super-resolution: what was done for each frame, and an estimate of
+# the full-frame SR time that was avoided
+sr_skipped_counter = metrics.counter("sr_skipped_total", "Frames whose face was large enough to skip SR")
+sr_crop_counter = metrics.counter("sr_face_crop_total", "Frames where only the small face crop was super-resolved")
+sr_fallback_counter = metrics.counter("sr_full_frame_total", "Frames super-resolved whole because the first pass found no face")
+sr_saved_hist = metrics.histogram("sr_saved_ms", [1, 5, 10, 25, 50, 100, 250],
+                                  "Estimated full-frame SR time saved per frame (ms)")
 
-def detect_face(image, apply_sr=True):
-    """
-    Detect the largest face in an image using YOLOv8
+# Hot-path timings, exported on /metrics
+yolo_hist = metrics.histogram("stage_yolo_ms", metrics.LATENCY_BUCKETS_MS, "YOLO face detection call (ms)")
+sr_hist = metrics.histogram("stage_sr_ms", metrics.LATENCY_BUCKETS_MS, "Super-resolution call (ms)")
 
-    Args:
-        image: Input RGB image
-        apply_sr: Whether to apply super-resolution
+# Running estimate of SR cost per input pixel (ms), from real SR calls
+_sr_ms_per_pixel = None
+
+
+def _timed_upsample(img_bgr):
+    """Super-resolve and update the per-pixel SR cost estimate"""
+    global _sr_ms_per_pixel
+
+    sr_model = get_model("super_resolution")
+    start = time.perf_counter()
+    upsampled = sr_model.upsample(img_bgr)
+    elapsed = (time.perf_counter() - start) * 1000
+    sr_hist.observe(elapsed)
+    pixels = img_bgr.shape[0] * img_bgr.shape[1]
+
+    # Tiny crops are dominated by per-call overhead and would inflate the rate
+    if pixels < 64 * 64:
+        return upsampled
+    rate = elapsed / pixels
+    _sr_ms_per_pixel = rate if _sr_ms_per_pixel is None else 0.9 * _sr_ms_per_pixel + 0.1 * rate
+    return upsampled
+
+
+def _to_bgr(image, bgr):
+    """YOLO and OpenCV work on BGR; frames decoded by OpenCV already are"""
+    return image if bgr else cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+
+def _prepare_frame(image, apply_sr, bgr=False):
+    """
+    Convert a frame to BGR and optionally super-resolve it
 
     Returns:
-        Cropped face image or None if no face detected
+        Tuple of (BGR frame for YOLO, upscaling factor applied)
     """
     # Convert to BGR for OpenCV processing
-    img_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    img_bgr = _to_bgr(image, bgr)
 
     # Apply super-resolution if requested
     if apply_sr:
-        img_bgr = sr_model.upsample(img_bgr)
+        return _timed_upsample(img_bgr), get_model("super_resolution").scale
+    return img_bgr, 1
 
-    # Detect faces
-    results = yolo_model.predict(img_bgr, conf=0.2, verbose=False)
 
-    # Extract face bounding boxes
-    faces = results[0].boxes.xyxy.cpu().numpy() if len(results) > 0 else []
+def _predict(frames):
+    """Timed YOLO call on one BGR frame or a list of them"""
+    yolo_model = get_model("yolo_face")
+    with yolo_hist.time():
+        return yolo_model.predict(frames, conf=0.2, verbose=False)
+
+
+def _result_boxes(result):
+    """xyxy boxes of one YOLO result (the ONNX detector returns them directly)"""
+    return result if isinstance(result, np.ndarray) else result.boxes.xyxy.cpu().numpy()
+
+
+def _clip_box(box, shape):
+    """Integer box clipped to the frame, or None if nothing is left of it"""
+    x1, y1, x2, y2 = map(int, box)
+    h, w = shape[:2]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def _largest_box(result, shape):
+    """
+    Largest detection in one YOLO result, clipped to the frame
+
+    Returns:
+        (x1, y1, x2, y2) ints or None if nothing usable was detected
+    """
+    faces = _result_boxes(result)
 
     if len(faces) == 0:
         return None
 
     # Select the largest face
     largest_face = max(faces, key=lambda box: (box[2] - box[0]) * (box[3] - box[1]))
-    x1, y1, x2, y2 = map(int, largest_face)
 
-    # Convert back to RGB for further processing
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    # Ensure coordinates are within image bounds
+    return _clip_box(largest_face, shape)
+
+
+def _largest_face(result, img_bgr, scale):
+    """
+    Pick the largest detection from one YOLO result and crop it
+
+    Returns:
+        Tuple of (cropped RGB face, box in pre-SR coordinates) or (None, None)
+    """
+    box = _largest_box(result, img_bgr.shape)
+    if box is None:
+        return None, None
+    x1, y1, x2, y2 = box
+
+    # Extract face region and convert back to RGB for further processing
+    face_img = cv2.cvtColor(img_bgr[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+
+    # Report the box relative to the frame the caller passed in
+    box = (x1 // scale, y1 // scale, x2 // scale, y2 // scale)
+
+    return face_img, box
+
+
+def _detect_adaptive(images, sr_min_face, bgr=False):
+    """
+    Two-stage detection: YOLO on native frames, SR only where it helps
+
+    A face whose shorter side is below sr_min_face pixels has just its crop
+    super-resolved before embedding. Frames where the first pass finds no
+    face are super-resolved whole and detected again.
+    """
+    frames = [_to_bgr(image, bgr) for image in images]
+    results = _predict(frames)
+
+    detections = [(None, None)] * len(frames)
+    retry = []
+    for i, (result, img_bgr) in enumerate(zip(results, frames)):
+        box = _largest_box(result, img_bgr.shape)
+        if box is None:
+            retry.append(i)
+            continue
+
+        x1, y1, x2, y2 = box
+        crop = img_bgr[y1:y2, x1:x2]
+        if min(x2 - x1, y2 - y1) < sr_min_face:
+            crop = _timed_upsample(crop)
+            sr_crop_counter.inc()
+            crop_pixels = (x2 - x1) * (y2 - y1)
+        else:
+            sr_skipped_counter.inc()
+            crop_pixels = 0
+
+        # Full-frame SR that did not have to run, minus the crop SR that did
+        if _sr_ms_per_pixel is not None:
+            h, w = img_bgr.shape[:2]
+            sr_saved_hist.observe(_sr_ms_per_pixel * (h * w - crop_pixels))
+        detections[i] = (cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), box)
+
+    if retry:
+        # Nothing found at native resolution: fall back to full-frame SR
+        upsampled = [_timed_upsample(frames[i]) for i in retry]
+        sr_fallback_counter.inc(len(retry))
+        results = _predict(upsampled)
+        for i, result, img_bgr in zip(retry, results, upsampled):
+            detections[i] = _largest_face(result, img_bgr, get_model("super_resolution").scale)
+
+    return detections
+
+
+def detect_faces_batch(images, apply_sr=True, sr_min_face=0, bgr=False):
+    """
+    Detect the largest face in each of several images with one YOLO call
+
+    Args:
+        images: List of RGB images (BGR if bgr is set)
+        apply_sr: Whether to apply super-resolution
+        sr_min_face: With apply_sr, run YOLO on the native frames first and
+            super-resolve only face crops smaller than this many pixels
+            (or whole frames without a detection); 0 super-resolves every
+            frame before detection
+        bgr: Frames are BGR as decoded by OpenCV, so no colour conversion
+            is needed before YOLO
+
+    Returns:
+        List of (cropped RGB face, box) tuples, (None, None) where no face
+        was detected
+    """
+    if len(images) == 0:
+        return []
+
+    if apply_sr and sr_min_face > 0:
+        return _detect_adaptive(images, sr_min_face, bgr)
+
+    frames = [_prepare_frame(image, apply_sr, bgr) for image in images]
+
+    # Detect faces in all frames with a single batched forward pass
+    results = _predict([img_bgr for img_bgr, _ in frames])
+
+    return [_largest_face(result, img_bgr, scale)
+            for result, (img_bgr, scale) in zip(results, frames)]
+
+
+def _all_faces(result, img_bgr, scale, sr_min_face):
+    """
+    Crop every detection in one YOLO result, largest first
+
+    Faces whose shorter side is below sr_min_face pixels have their crop
+    super-resolved (only when the frame itself was not).
+
+    Returns:
+        List of (cropped RGB face, box in pre-SR coordinates)
+    """
+    boxes = [_clip_box(box, img_bgr.shape) for box in _result_boxes(result)]
+    boxes = sorted((box for box in boxes if box is not None),
+                   key=lambda box: (box[2] - box[0]) * (box[3] - box[1]), reverse=True)
+
+    faces = []
+    for x1, y1, x2, y2 in boxes:
+        crop = img_bgr[y1:y2, x1:x2]
+        if scale == 1 and min(x2 - x1, y2 - y1) < sr_min_face:
+            crop = _timed_upsample(crop)
+            sr_crop_counter.inc()
+        faces.append((cv2.cvtColor(crop, cv2.COLOR_BGR2RGB),
+                      (x1 // scale, y1 // scale, x2 // scale, y2 // scale)))
+    return faces
+
+
+def detect_all_faces_batch(images, apply_sr=True, sr_min_face=0, bgr=False):
+    """
+    Detect every face in each of several images with one YOLO call
+
+    Args:
+        images: List of RGB images (BGR if bgr is set)
+        apply_sr: Whether to apply super-resolution
+        sr_min_face: With apply_sr, detect on the native frames and
+            super-resolve only face crops smaller than this many pixels;
+            0 super-resolves every frame before detection
+        bgr: Frames are BGR as decoded by OpenCV
+
+    Returns:
+        One list per image of (cropped RGB face, box) tuples, largest face
+        first; empty where no face was detected
+    """
+    if len(images) == 0:
+        return []
+
+    adaptive = apply_sr and sr_min_face > 0
+    frames = [_prepare_frame(image, apply_sr and not adaptive, bgr) for image in images]
+    results = _predict([img_bgr for img_bgr, _ in frames])
 
-    # Extract face region
-    face_img = img_rgb[y1:y2, x1:x2]
+    return [_all_faces(result, img_bgr, scale, sr_min_face if adaptive else 0)
+            for result, (img_bgr, scale) in zip(results, frames)]
 
-    return face_img
\ No newline at end of file
+
+def detect_face_box(image, apply_sr=True, sr_min_face=0):
+    """
+    Detect the largest face in an image and keep its bounding box
+
+    Args:
+        image: Input RGB image
+        apply_sr: Whether to apply super-resolution
+        sr_min_face: Adaptive SR threshold, see detect_faces_batch()
+
+    Returns:
+        Tuple of (cropped RGB face, (x1, y1, x2, y2) box in input image
+        coordinates) or (None, None) if no face detected
+    """
+    if apply_sr and sr_min_face > 0:
+        return _detect_adaptive([image], sr_min_face)[0]
+
+    img_bgr, scale = _prepare_frame(image, apply_sr)
+
+    # Detect faces
+    results = _predict(img_bgr)
+    if len(results) == 0:
+        return None, None
+
+    return _largest_face(results[0], img_bgr, scale)
+
+
+def detect_face(image, apply_sr=True, sr_min_face=0):
+    """
+    Detect the largest face in an image using YOLOv8
+
+    Args:
+        image: Input RGB image
+        apply_sr: Whether to apply super-resolution
+        sr_min_face: Adaptive SR threshold, see detect_faces_batch()
+
+    Returns:
+        Cropped face image or None if no face detected
+    """
+    face_img, _ = detect_face_box(image, apply_sr=apply_sr, sr_min_face=sr_min_face)
+    return face_img
@@ -0,0 +1,222 @@
+import os
+import pickle
+import re
+import threading
+from datetime import datetime
+import numpy as np
+from .gallery_store import read_gallery, write_gallery
+from .manifest import IMAGE_EXTENSIONS, atomic_pickle_dump, load_manifest, make_entry, manifest_path_for, save_manifest
+
+
+# Labels name dataset folders, so nothing that could leave the dataset root
+LABEL_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def employee_label(name):
+    """
+    Gallery label / dataset folder for an employee name: 'Daksh Maru' -> 'Daksh_Maru'
+
+    Raises:
+        ValueError: The name contains characters other than letters, digits,
+            '_', '-' and whitespace
+    """
+    label = "_".join(name.split())
+    if not LABEL_PATTERN.fullmatch(label):
+        raise ValueError(f"Name {name!r} cannot be used as a gallery label; "
+                         "use letters, digits, '_', '-' and spaces only")
+    return label
+
+
+class Enroller:
+    def __init__(self, embeddings_path, dataset_path, gallery_manager=None, on_persist=None, persist_delay=1.0):
+        """
+        Adds faces to the live gallery and persists them in the background
+
+        Each identity's mean embedding is kept together with the number of
+        images behind it, so a new image updates the mean in O(1). Saved
+        images and their embeddings are also recorded in the dataset folder
+        and the manifest, so the next offline generate_embeddings run treats
+        them as already embedded.
+
+        Args:
+            embeddings_path: Gallery (.gallery) or pickle path the API loads;
+                both files next to it are kept up to date
+            dataset_path: Dataset folder (one sub-folder per identity)
+            gallery_manager: GalleryManager to update in place, or None when
+                the gallery lives in inference worker processes
+            on_persist: Called after the files are written (e.g. to signal
+                workers to reload)
+            persist_delay: Seconds to wait before writing, so bursts of
+                enrollments are written once
+        """
+        base = os.path.splitext(embeddings_path)[0]
+        self.pkl_path = base + ".pkl"
+        self.gallery_path = base + ".gallery"
+        self.manifest_path = manifest_path_for(self.pkl_path)
+        self.dataset_path = dataset_path
+        self.gallery_manager = gallery_manager
+        self.on_persist = on_persist
+        self.persist_delay = persist_delay
+
+        self._lock = threading.Lock()
+        self._timer = None
+        self._dirty = set()
+        self._pending_entries = {}
+
+        self._means = {}
+        self._counts = {}
+        self._source = None
+        self._sync_from_disk()
+
+    def _sync_from_disk(self):
+        """
+        Pick up the stored means if they changed on disk since they were last read
+
+        The pickle is the source; a deployment with only the .gallery file
+        (gallery_store convert) is seeded from that instead, since
+        persisting from an empty base would overwrite it with just the newly
+        enrolled identities. An offline generate_embeddings run may rewrite
+        the files while the API is up; their means replace ours, except for
+        identities with enrollments not yet persisted. Called with the lock
+        held (or from __init__).
+
+        Raises:
+            Whatever reading an existing file raises; nothing is persisted
+            until the stored means could be read
+        """
+        path = self.pkl_path if os.path.exists(self.pkl_path) else self.gallery_path
+        try:
+            source = (path, os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            # Nothing enrolled yet
+            return
+        if source == self._source:
+            return
+
+        if path == self.pkl_path:
+            with open(path, "rb") as f:
+                means = pickle.load(f)
+        else:
+            # Rows are the L2-normalised means; new images average into them
+            labels, matrix = read_gallery(path)
+            means = {label: np.array(row) for label, row in zip(labels, matrix)}
+        counts = self._initial_counts(means, load_manifest(self.manifest_path))
+        for label in self._dirty:
+            means[label] = self._means[label]
+            counts[label] = self._counts[label]
+        self._means, self._counts, self._source = means, counts, source
+
+    def _initial_counts(self, means, entries):
+        """Images behind each stored mean, from the manifest or the dataset folder"""
+        counts = {}
+        for rel_path, entry in entries.items():
+            if entry["embedding"] is not None:
+                person = rel_path.split("/", 1)[0]
+                counts[person] = counts.get(person, 0) + 1
+
+        for person in means:
+            if person not in counts:
+                # No manifest yet: assume every image in the folder contributed
+                folder = os.path.join(self.dataset_path, person)
+                images = [f for f in os.listdir(folder) if f.endswith(IMAGE_EXTENSIONS)] if os.path.isdir(folder) else []
+                counts[person] = max(1, len(images))
+        return counts
+
+    def add_faces(self, label, faces):
+        """
+        Enroll new face images for one identity
+
+        Args:
+            label: Identity name (dataset folder name), see employee_label()
+            faces: List of (original filename, image bytes, embedding)
+
+        Returns:
+            Number of images now behind the identity's mean embedding
+
+        Raises:
+            ValueError: The label is not a plain folder name
+        """
+        folder = self._identity_folder(label)
+        os.makedirs(folder, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        with self._lock:
+            self._sync_from_disk()
+            count = self._counts.get(label, 0)
+            mean = self._means.get(label)
+
+            for i, (filename, image_bytes, embedding) in enumerate(faces):
+                # Running mean: O(1) per image, independent of gallery size
+                count += 1
+                embedding = np.asarray(embedding, dtype=np.float32)
+                mean = embedding if mean is None else mean + (embedding - mean) / count
+
+                # Keep the image in the dataset so offline rebuilds include it
+                ext = os.path.splitext(filename or "")[1].lower()
+                ext = ext if ext in IMAGE_EXTENSIONS else ".jpg"
+                image_name = f"{label}_{timestamp}_{i}{ext}"
+                image_path = os.path.join(folder, image_name)
+                with open(image_path, "wb") as f:
+                    f.write(image_bytes)
+                self._pending_entries[f"{label}/{image_name}"] = make_entry(image_path, embedding)
+
+            self._means[label] = mean
+            self._counts[label] = count
+            self._dirty.add(label)
+
+            if self.gallery_manager is not None:
+                self.gallery_manager.upsert(label, mean)
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.persist_delay, self._persist)
+                self._timer.daemon = True
+                self._timer.start()
+
+        return count
+
+    def _identity_folder(self, label):
+        """Dataset folder for a label, refusing anything that resolves outside the dataset"""
+        if not LABEL_PATTERN.fullmatch(label):
+            raise ValueError(f"Invalid gallery label {label!r}")
+        root = os.path.realpath(self.dataset_path)
+        folder = os.path.realpath(os.path.join(root, label))
+        if os.path.dirname(folder) != root:
+            raise ValueError(f"Gallery label {label!r} resolves outside the dataset folder")
+        return folder
+
+    def _persist(self):
+        """Write the manifest, pickle and gallery file for all pending enrollments"""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+
+            try:
+                entries = load_manifest(self.manifest_path)
+                entries.update(self._pending_entries)
+
+                # Start from what is on disk so offline changes to other
+                # identities are kept, then apply the online updates
+                self._sync_from_disk()
+                embeddings_dict = dict(self._means)
+
+                atomic_pickle_dump(embeddings_dict, self.pkl_path)
+                write_gallery(self.gallery_path, list(embeddings_dict), list(embeddings_dict.values()))
+                save_manifest(self.manifest_path, entries)
+                self._source = (self.pkl_path, os.stat(self.pkl_path).st_mtime_ns)
+            except Exception as e:
+                # Leave the updates pending; the next enrollment retries the write
+                print(f"Failed to persist enrollments: {e}")
+                return
+
+            print(f"Persisted enrollments for {len(self._dirty)} identities")
+            self._dirty.clear()
+            self._pending_entries.clear()
+
+            # Reload while still holding the lock so no enrollment can slip
+            # in between the write and the swap and be dropped by it
+            if self.gallery_manager is not None:
+                self.gallery_manager.reload()
+
+        if self.on_persist is not None:
+            self.on_persist()
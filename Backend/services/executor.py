@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+
+inflight_gauge = metrics.gauge("inference_inflight", "Inference jobs running or queued")
+rejected_counter = metrics.counter("inference_rejected_total", "Inference jobs rejected because the queue was full")
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference executor has no free slot for a new job"""
+
+
+class InferenceExecutor:
+    def __init__(self, max_workers=2, max_queue=16):
+        """
+        Bounded thread pool that keeps blocking CV/ML work off the event loop
+
+        At most max_workers jobs run at once and at most max_queue more wait
+        for a worker; anything beyond that is rejected immediately so callers
+        can shed load instead of piling up latency. Low-priority work (bulk
+        jobs) goes through run_when_idle() and only ever takes a free worker.
+
+        Args:
+            max_workers: Number of worker threads
+            max_queue: Number of jobs allowed to wait for a worker
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._inflight = 0
+
+    def _acquire(self, limit):
+        with self._lock:
+            if self._inflight >= limit:
+                return False
+            self._inflight += 1
+        inflight_gauge.inc()
+        return True
+
+    def _release(self, _future):
+        with self._lock:
+            self._inflight -= 1
+        inflight_gauge.dec()
+
+    def _submit(self, fn, args):
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+
+        # Free the slot when the job finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(self, fn, *args):
+        """
+        Schedule fn(*args) on the pool
+
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            ExecutorSaturated: If all worker and queue slots are taken
+        """
+        if not self._acquire(self.max_workers + self.max_queue):
+            rejected_counter.inc()
+            raise ExecutorSaturated("Inference queue is full")
+        return self._submit(fn, args)
+
+    async def run(self, fn, *args):
+        """Awaitable wrapper around submit() for async routes"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def run_when_idle(self, fn, *args, poll_interval=0.02):
+        """
+        Run fn(*args) on the pool as low-priority work and return its result
+
+        Blocks until a worker is free rather than queueing, so the job never
+        takes a queue slot from, or waits ahead of, regular submit() callers.
+        Meant for background threads, not the event loop.
+        """
+        while not self._acquire(self.max_workers):
+            time.sleep(poll_interval)
+        return self._submit(fn, args).result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,221 @@
+import os
+import pickle
+import numpy as np
+from . import metrics
+from .index import build_index
+from .gallery_store import read_gallery
+
+# FaceNet (InceptionResnetV1) embedding size
+EMBEDDING_DIM = 512
+
+
+def l2_normalize(vectors):
+    """
+    L2-normalise a single vector or a batch of row vectors as float32
+
+    Args:
+        vectors: Array of shape (dim,) or (n, dim)
+
+    Returns:
+        float32 array of shape (n, dim)
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingGallery:
+    def __init__(self, labels, embeddings, index="exact", normalized=False, **index_params):
+        """
+        Enrolled face embeddings stored as one contiguous float32 matrix
+
+        Rows are L2-normalised, so distances are between unit vectors. This
+        differs from the original dict matcher for identities enrolled from
+        several images: their stored mean is shorter than 1, and normalising
+        it moves genuine matches further away (e.g. |m| = 0.8 and cosine 0.7
+        give 0.72 before, 0.77 after), so recall at a fixed threshold can
+        drop slightly. Single-image identities match exactly as before;
+        benchmarks.match_threshold compares the two on a gallery / dataset.
+
+        Args:
+            labels: Sequence of identity names, one per row
+            embeddings: Array of shape (n, dim) with one embedding per identity
+            index: Nearest-neighbour backend ('exact' or 'ivf')
+            normalized: embeddings is already an L2-normalised float32
+                matrix and is used as-is (no copy), e.g. a memory map
+            **index_params: Backend options, e.g. nlist / nprobe for 'ivf'
+        """
+        self.labels = np.asarray(labels, dtype=object)
+        if len(self.labels) == 0:
+            self.matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        elif normalized:
+            self.matrix = embeddings
+        else:
+            self.matrix = np.ascontiguousarray(l2_normalize(embeddings))
+
+        if self.matrix.shape[0] != len(self.labels):
+            raise ValueError("Number of labels does not match number of embeddings")
+
+        self.index = build_index(self.matrix, index, **index_params)
+
+        # Growable copy of the matrix and label -> row lookup, created by the
+        # first upsert()
+        self._buffer = None
+        self._rows = None
+
+    @classmethod
+    def from_dict(cls, embeddings_dict, index="exact", **index_params):
+        """
+        Build a gallery from the {name: embedding} dict stored in embeddings.pkl
+        """
+        labels = list(embeddings_dict.keys())
+        embeddings = [embeddings_dict[name] for name in labels]
+        return cls(labels, embeddings, index, **index_params)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def _reserve(self, size):
+        """Make sure the matrix lives in a writable buffer with room for size rows"""
+        if self._buffer is not None and size <= len(self._buffer):
+            return
+
+        n = len(self.matrix)
+        buffer = np.empty((max(size, 2 * n, 16), self.dim), dtype=np.float32)
+        buffer[:n] = self.matrix
+        self._buffer = buffer
+        self.matrix = buffer[:n]
+
+    def upsert(self, label, embedding):
+        """
+        Insert or replace one identity's embedding in place
+
+        Replacing writes a single row; inserting appends into spare capacity
+        that grows geometrically, so both are amortised O(dim) regardless of
+        gallery size. A memory-mapped matrix is copied into RAM on the first
+        write. Writers must be serialised by the caller; concurrent readers
+        see either the old or the new row.
+
+        Args:
+            label: Identity name
+            embedding: Embedding of shape (dim,); stored L2-normalised
+        """
+        vector = l2_normalize(embedding)[0]
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self.labels)}
+
+        row = self._rows.get(label)
+        if row is not None:
+            self._reserve(len(self))
+            self.matrix[row] = vector
+            self.index.upsert(row, vector, self.matrix)
+            return
+
+        row = len(self)
+        self._reserve(row + 1)
+        self._buffer[row] = vector
+        matrix = self._buffer[:row + 1]
+
+        # Publish the label before the index can return its row
+        self.labels = np.append(self.labels, np.array([label], dtype=object))
+        self.matrix = matrix
+        self._rows[label] = row
+        self.index.upsert(row, vector, matrix)
+
+    def search(self, queries, k=1):
+        """
+        Find the k nearest enrolled identities for each query embedding
+
+        Distances are Euclidean distances between L2-normalised vectors,
+        computed from a single matrix product: ||q - g||^2 = 2 - 2 * q.g
+
+        Args:
+            queries: Query embedding of shape (dim,) or batch of shape (n, dim)
+            k: Number of neighbours to return per query
+
+        Returns:
+            Tuple of (labels, distances), each of shape (n, k) sorted by
+            increasing distance. k is capped at the gallery size. Slots an
+            approximate index could not fill have label and distance None.
+        """
+        queries = l2_normalize(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return (np.empty((len(queries), 0), dtype=object),
+                    np.empty((len(queries), 0), dtype=np.float32))
+
+        ids, similarities = self.index.search(queries, k)
+
+        # Approximate backends pad missing neighbours with id -1
+        labels = np.where(ids >= 0, self.labels[np.maximum(ids, 0)], None)
+        distances = np.sqrt(np.maximum(2.0 - 2.0 * similarities, 0.0))
+        if (ids < 0).any():
+            # Their similarity is -inf; inf is not valid JSON
+            distances = np.where(ids >= 0, distances, None)
+        return labels, distances
+
+    @metrics.timed("stage_match", "Gallery nearest-neighbour match of one batch (ms)")
+    def match(self, queries, threshold=0.8):
+        """
+        Identify each query embedding, or "Unknown" if nothing is close enough
+
+        Args:
+            queries: Query embedding of shape (dim,) or batch of shape (n, dim)
+            threshold: Maximum distance for a match
+
+        Returns:
+            Tuple of (identities, distances) with one entry per query; the
+            distance is None when there was no candidate at all (empty
+            gallery, or no neighbour in the probed IVF buckets)
+        """
+        labels, distances = self.search(queries, k=1)
+        if labels.shape[1] == 0:
+            n = labels.shape[0]
+            return ["Unknown"] * n, [None] * n
+
+        identities = []
+        for label, dist in zip(labels[:, 0], distances[:, 0]):
+            identities.append(label if label is not None and dist < threshold else "Unknown")
+        return identities, [None if dist is None else float(dist) for dist in distances[:, 0]]
+
+
+def load_gallery(path="assets/embeddings.gallery", index="exact", **index_params):
+    """
+    Load enrolled embeddings into an EmbeddingGallery
+
+    A .gallery file (see services.gallery_store) is memory-mapped, so all
+    worker processes share one copy in the page cache; with the exact index
+    the matrix is never copied. Any other path is read as a pickled
+    {name: embedding} dict. If a .gallery file is missing but the .pkl next
+    to it exists, the pickle is used instead.
+
+    Args:
+        path: Path to a .gallery file or embeddings pickle
+        index: Nearest-neighbour backend ('exact' or 'ivf')
+        **index_params: Backend options, e.g. nlist / nprobe for 'ivf'
+
+    Returns:
+        EmbeddingGallery (empty if no embeddings file exists)
+    """
+    if path.endswith(".gallery"):
+        if os.path.exists(path):
+            labels, matrix = read_gallery(path)
+            return EmbeddingGallery(labels, matrix, index, normalized=True, **index_params)
+
+        pkl_path = os.path.splitext(path)[0] + ".pkl"
+        print(f"Gallery {path} not found; falling back to {pkl_path}. "
+              f"Convert it with: python -m services.gallery_store convert")
+        path = pkl_path
+
+    try:
+        with open(path, "rb") as f:
+            embeddings_dict = pickle.load(f)
+    except FileNotFoundError:
+        embeddings_dict = {}
+
+    return EmbeddingGallery.from_dict(embeddings_dict, index, **index_params)
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from .gallery import load_gallery
+
+
+def file_signature(path):
+    """(path, mtime, size, inode) of the file load_gallery(path) would read, or None"""
+    candidates = [path]
+    if path.endswith(".gallery"):
+        candidates.append(os.path.splitext(path)[0] + ".pkl")
+
+    for candidate in candidates:
+        try:
+            stat = os.stat(candidate)
+        except FileNotFoundError:
+            continue
+        return candidate, stat.st_mtime_ns, stat.st_size, stat.st_ino
+    return None
+
+
+class GalleryManager:
+    def __init__(self, path, index="exact", index_params=None, poll_interval=0, reload_signal=None,
+                 watch_file=True):
+        """
+        Holds the live EmbeddingGallery and swaps in new versions atomically
+
+        A reload builds the new gallery (and its index) completely off to
+        the side and then replaces the reference in one assignment. Callers
+        that already started a match keep the gallery they started with, so
+        nobody ever sees a half-loaded state.
+
+        Args:
+            path: Embeddings file (.gallery or .pkl) to load and watch
+            index: Nearest-neighbour backend ('exact' or 'ivf')
+            index_params: Backend options, e.g. nlist / nprobe for 'ivf'
+            poll_interval: Seconds between checks of the backing file;
+                0 disables watching
+            reload_signal: Optional shared multiprocessing.Value; bumping it
+                from another process forces a reload on the next poll
+            watch_file: Reload when the backing file changes; if False the
+                poll only checks reload_signal
+        """
+        self.path = path
+        self.index = index
+        self.index_params = index_params or {}
+        self.poll_interval = poll_interval
+        self.reload_signal = reload_signal
+        self.watch_file = watch_file
+        self.generation = 0
+
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._signature = self._file_signature()
+        self._signal_seen = reload_signal.value if reload_signal is not None else 0
+        self._gallery = load_gallery(path, index, **self.index_params)
+
+        if poll_interval > 0:
+            threading.Thread(target=self._watch, name="gallery-watcher", daemon=True).start()
+
+    @property
+    def gallery(self):
+        """Current gallery snapshot; hold on to it for a consistent view"""
+        return self._gallery
+
+    @property
+    def signature(self):
+        """file_signature() of the file the current gallery was loaded from"""
+        return self._signature
+
+    def __len__(self):
+        return len(self._gallery)
+
+    def search(self, queries, k=1):
+        return self._gallery.search(queries, k)
+
+    def match(self, queries, threshold=0.8):
+        return self._gallery.match(queries, threshold)
+
+    def upsert(self, label, embedding):
+        """
+        Insert or replace one identity in the live gallery in place
+
+        Serialised with reloads so an update is never applied to a gallery
+        that is about to be replaced.
+        """
+        with self._reload_lock:
+            self._gallery.upsert(label, embedding)
+
+        for callback in self._listeners:
+            callback(self._gallery)
+
+    def add_listener(self, callback):
+        """Call callback(gallery) after every swap or in-place update"""
+        self._listeners.append(callback)
+
+    def _file_signature(self):
+        return file_signature(self.path)
+
+    def reload(self, force=False):
+        """
+        Rebuild the gallery from disk and swap it in
+
+        Args:
+            force: Reload even if the backing file looks unchanged
+
+        Returns:
+            True if a new gallery was swapped in
+        """
+        # One rebuild at a time; concurrent callers wait and then see the
+        # file unchanged, so they do not rebuild again
+        with self._reload_lock:
+            signature = self._file_signature()
+            if not force and signature == self._signature:
+                return False
+
+            start = time.perf_counter()
+            try:
+                gallery = load_gallery(self.path, self.index, **self.index_params)
+            except Exception as e:
+                # Keep serving the previous gallery if the new file is bad
+                print(f"Gallery reload from {self.path} failed: {e}")
+                return False
+
+            self._gallery = gallery
+            self._signature = signature
+            self.generation += 1
+            print(f"Gallery reloaded: {len(gallery)} identities "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms (generation {self.generation})")
+
+        for callback in self._listeners:
+            callback(gallery)
+        return True
+
+    def request_reload(self):
+        """Ask every process sharing reload_signal to reload on its next poll"""
+        if self.reload_signal is None:
+            return self.reload(force=True)
+        with self.reload_signal.get_lock():
+            self.reload_signal.value += 1
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+
+            force = False
+            if self.reload_signal is not None and self.reload_signal.value != self._signal_seen:
+                self._signal_seen = self.reload_signal.value
+                force = True
+            if not force and not self.watch_file:
+                continue
+
+            try:
+                self.reload(force=force)
+            except Exception as e:
+                print(f"Gallery watcher error: {e}")
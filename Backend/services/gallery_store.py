@@ -0,0 +1,148 @@
+"""
+Versioned on-disk gallery format that can be memory-mapped
+
+Layout (little-endian):
+    [0:64)          header: magic, version, count, dim, matrix offset,
+                    label table offset, label table size
+    [4096:...)      float32 matrix (count x dim), L2-normalised, row-major
+    [labels:...)    label table: UTF-8 JSON list, one label per row
+
+The matrix starts on a page boundary so np.memmap can map it directly;
+every process that opens the file shares the same page-cache pages.
+
+Usage (from Backend/):
+    python -m services.gallery_store convert assets/embeddings.pkl assets/embeddings.gallery
+    python -m services.gallery_store info assets/embeddings.gallery
+"""
+import argparse
+import json
+import os
+import pickle
+import struct
+import numpy as np
+
+MAGIC = b"FACEGAL\0"
+FORMAT_VERSION = 1
+
+# magic, version, count, dim, matrix offset, labels offset, labels size
+_HEADER = struct.Struct("<8sIIIQQQ")
+_HEADER_SIZE = 64
+_MATRIX_ALIGN = 4096
+
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_gallery(path, labels, embeddings, dim=512):
+    """
+    Write a gallery file atomically (temporary file + rename)
+
+    Args:
+        path: Output path
+        labels: Sequence of identity names, one per row
+        embeddings: Embeddings of shape (n, dim); rows are L2-normalised
+            before writing
+        dim: Embedding size, used when there are no rows
+    """
+    labels = [str(label) for label in labels]
+    if len(labels) == 0:
+        matrix = np.zeros((0, dim), dtype="<f4")
+    else:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = np.ascontiguousarray(matrix / norms, dtype="<f4")
+
+    if matrix.ndim != 2 or matrix.shape[0] != len(labels):
+        raise ValueError("Expected one matrix row per label")
+
+    label_bytes = json.dumps(labels).encode("utf-8")
+    matrix_offset = _align(_HEADER_SIZE, _MATRIX_ALIGN)
+    labels_offset = matrix_offset + matrix.nbytes
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, matrix.shape[0], matrix.shape[1],
+                          matrix_offset, labels_offset, len(label_bytes))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(matrix_offset, b"\0"))
+        f.write(matrix.tobytes())
+        f.write(label_bytes)
+
+    # Readers that already mapped the old file keep their pages; new
+    # readers see the complete new file, never a partial one
+    os.replace(tmp_path, path)
+
+
+def read_gallery(path):
+    """
+    Open a gallery file without copying the matrix
+
+    Args:
+        path: Gallery file path
+
+    Returns:
+        Tuple of (labels list, read-only float32 np.memmap of shape (n, dim))
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is not a gallery file (truncated header)")
+
+        magic, version, count, dim, matrix_offset, labels_offset, labels_size = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gallery file (bad magic)")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported gallery format version {version}")
+
+        f.seek(labels_offset)
+        labels = json.loads(f.read(labels_size).decode("utf-8"))
+
+    if len(labels) != count:
+        raise ValueError(f"{path} is corrupt: {len(labels)} labels for {count} rows")
+    if count == 0:
+        return labels, np.zeros((0, dim), dtype=np.float32)
+
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=matrix_offset, shape=(count, dim))
+    return labels, matrix
+
+
+def convert_pickle(pkl_path, gallery_path):
+    """
+    Convert a pickled {name: embedding} dict into a gallery file
+
+    Returns:
+        Number of identities written
+    """
+    with open(pkl_path, "rb") as f:
+        embeddings_dict = pickle.load(f)
+
+    labels = list(embeddings_dict.keys())
+    write_gallery(gallery_path, labels, [embeddings_dict[name] for name in labels])
+    return len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert embeddings.pkl to a gallery file")
+    convert.add_argument("pkl_path", nargs="?", default="assets/embeddings.pkl")
+    convert.add_argument("gallery_path", nargs="?", default="assets/embeddings.gallery")
+
+    info = subparsers.add_parser("info", help="Print a gallery file's header")
+    info.add_argument("gallery_path", nargs="?", default="assets/embeddings.gallery")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        count = convert_pickle(args.pkl_path, args.gallery_path)
+        print(f"Wrote {count} identities to {args.gallery_path}")
+    else:
+        labels, matrix = read_gallery(args.gallery_path)
+        print(f"{args.gallery_path}: format v{FORMAT_VERSION}, {matrix.shape[0]} identities, "
+              f"dim {matrix.shape[1]}, {os.path.getsize(args.gallery_path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,27 @@
+import argparse
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
-import pickle
-import torch
-from facenet_pytorch import InceptionResnetV1
 from PIL import Image
-from torchvision import transforms
-from ultralytics import YOLO
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# Define the correct path to the YOLOv8 face model
-MODEL_PATH = os.path.join(BASE_DIR, "..", "assets", "yolov8n-face.pt")
-
-# Check if model exists
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"YOLOv8 face model not found at {MODEL_PATH}. Please ensure the model file exists.")
+try:
+    from .gallery_store import write_gallery
+    from .manifest import (atomic_pickle_dump, find_changes, load_manifest, make_entry,
+                           manifest_path_for, mean_embeddings, save_manifest, scan_dataset)
+    from .model_registry import face_transform, get_model
+except ImportError:  # Run as a script: python services/generate_embeddings.py
+    from gallery_store import write_gallery
+    from manifest import (atomic_pickle_dump, find_changes, load_manifest, make_entry,
+                          manifest_path_for, mean_embeddings, save_manifest, scan_dataset)
+    from model_registry import face_transform, get_model
 
-# Initialize YOLOv8 model for face detection
-yolo_model = YOLO(MODEL_PATH)
-print(f"YOLOv8 face detection model loaded from {MODEL_PATH}")
-
-# Initialize InceptionResnetV1 for embedding extraction
-model = InceptionResnetV1(pretrained='vggface2').eval()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Transformation for input images
-transform = transforms.Compose([
-    transforms.Resize((160, 160)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-])
+# YOLOv8-face and FaceNet come from the shared model registry, so they are
+# loaded only when there is something to embed and never twice per process
 
 
 def detect_face(image):
@@ -58,10 +50,26 @@ def detect_face(image):
     img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
 
     # Detect faces
-    results = yolo_model.predict(img_bgr, conf=0.2, verbose=False)
+    results = get_model("yolo_face").predict(img_bgr, conf=0.2, verbose=False)
+    if len(results) == 0:
+        return None
+
+    return _crop_largest_face(results[0], img_np)
+
+
+def _crop_largest_face(result, img_np):
+    """
+    Crop the largest detection of one YOLO result
+
+    Args:
+        result: ultralytics Results for img_np
+        img_np: RGB image the detections refer to
 
+    Returns:
+        Cropped face as a PIL Image or None if no face detected
+    """
     # Extract face bounding boxes
-    faces = results[0].boxes.xyxy.cpu().numpy() if len(results) > 0 else []
+    faces = result.boxes.xyxy.cpu().numpy()
 
     if len(faces) == 0:
         return None
@@ -102,12 +110,14 @@ def get_embedding(image_path):
         face = detect_face(img)
 
         if face is not None:
+            import torch
+
             # Transform face for the model
-            face_tensor = transform(face).unsqueeze(0)  # Add batch dimension
+            face_tensor = face_transform()(face).unsqueeze(0)  # Add batch dimension
 
             # Generate embedding
             with torch.no_grad():
-                embedding = model(face_tensor)
+                embedding = get_model("facenet")(face_tensor)
 
             return embedding.detach().cpu().numpy()[0]  # Return as numpy array
     except Exception as e:
@@ -116,49 +126,185 @@ def get_embedding(image_path):
     return None  # Return None if any error occurs or no face detected
 
 
-# Main function to generate and save embeddings
-def save_embeddings(dataset_path: str, pkl_output_path: str = "assets/embeddings.pkl"):
-    embeddings_dict = {}
+def _load_rgb(image_path):
+    """Decode an image file to an RGB numpy array (runs on a decoder thread)"""
+    try:
+        return np.array(Image.open(image_path).convert('RGB'))
+    except Exception as e:
+        print(f"Error processing {image_path}: {e}")
+        return None
 
-    # Loop over each employee folder
-    for emp_folder in os.listdir(dataset_path):
-        folder_path = os.path.join(dataset_path, emp_folder)
-        if not os.path.isdir(folder_path):  # Skip if it's not a directory
-            continue
 
-        embeddings_list = []
-        images = [f for f in os.listdir(folder_path) if f.endswith(('.jpg', '.png', '.jpeg'))]
+def _iter_decoded(items, workers, prefetch):
+    """
+    Decode images on a thread pool, yielding them in order
 
-        print(f"Processing {len(images)} images for {emp_folder}")
+    At most `prefetch` images are decoded ahead of the consumer, so memory
+    stays bounded while decoding overlaps with inference.
 
-        # Loop over images and extract embeddings
-        for img_name in images:
-            image_path = os.path.join(folder_path, img_name)
-            embedding = get_embedding(image_path)
+    Args:
+        items: List of (key, image_path) tuples
+        workers: Number of decoder threads
+        prefetch: Maximum number of decoded images held in memory
+
+    Yields:
+        (key, image_path, RGB image or None)
+    """
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, image_path in items:
+            pending.append((key, image_path, pool.submit(_load_rgb, image_path)))
+            if len(pending) >= prefetch:
+                break
+
+        while pending:
+            key, image_path, future = pending.popleft()
+            next_item = next(items, None)
+            if next_item is not None:
+                pending.append((*next_item, pool.submit(_load_rgb, next_item[1])))
+            yield key, image_path, future.result()
+
+
+def embed_batch(images):
+    """
+    Detect and embed the largest face of several images with one YOLO call
+    and one FaceNet forward pass
+
+    Args:
+        images: List of RGB numpy arrays
+
+    Returns:
+        List with one embedding (numpy array) or None per image
+    """
+    if len(images) == 0:
+        return []
+
+    # Detect faces in all images at once
+    import torch
+
+    results = get_model("yolo_face").predict([cv2.cvtColor(img, cv2.COLOR_RGB2BGR) for img in images],
+                                 conf=0.2, verbose=False)
+    faces = [_crop_largest_face(result, img) for result, img in zip(results, images)]
+
+    embeddings = [None] * len(images)
+    found = [i for i, face in enumerate(faces) if face is not None]
+    if not found:
+        return embeddings
+
+    # Transform faces for the model and embed them as one batch
+    transform = face_transform()
+    face_tensor = torch.stack([transform(faces[i]) for i in found])
+    with torch.no_grad():
+        batch_embeddings = get_model("facenet")(face_tensor).detach().cpu().numpy()
+
+    for row, i in enumerate(found):
+        embeddings[i] = batch_embeddings[row]
+    return embeddings
 
-            if embedding is not None:
-                embeddings_list.append(embedding)
 
-        if embeddings_list:  # Only save if at least one embedding was found
-            # Use the average embedding of all images
-            embeddings_dict[emp_folder] = np.mean(embeddings_list, axis=0)
-            print(f"✅ Generated embedding for {emp_folder}")
+# Main function to generate and save embeddings
+def save_embeddings(dataset_path: str, pkl_output_path: str = "assets/embeddings.pkl",
+                    workers: int = 4, batch_size: int = 16, incremental: bool = True):
+    """
+    Generate the per-person mean embeddings for a dataset folder
+
+    Images are decoded by a pool of `workers` threads and pushed through
+    YOLO and FaceNet `batch_size` at a time. Per-image embeddings are cached
+    in a manifest next to the output, keyed by file content hash, so an
+    incremental run only embeds added or changed images; per-person means
+    are then recomputed from the cached vectors.
+
+    Args:
+        dataset_path: Folder with one sub-folder of images per employee
+        pkl_output_path: Where to write the {name: embedding} pickle
+        workers: Number of image decoder threads
+        batch_size: Images per batched YOLO / FaceNet call
+        incremental: Reuse the manifest; False re-embeds every image
+    """
+    manifest_path = manifest_path_for(pkl_output_path)
+    entries = load_manifest(manifest_path) if incremental else {}
+
+    # Work out which images are new, changed or gone since the last run
+    people, items = scan_dataset(dataset_path)
+    to_process, removed = find_changes(entries, items)
+
+    print(f"{len(items)} images for {len(people)} employees: {len(to_process)} to embed, "
+          f"{len(items) - len(to_process)} cached, {removed} removed "
+          f"({workers} decoder threads, batch size {batch_size})")
+
+    start = time.perf_counter()
+    processed = 0
+    batch = []
+
+    def flush(batch):
+        try:
+            embeddings = embed_batch([img for _, _, img in batch])
+        except Exception as e:
+            # Fall back to one image at a time so a single bad image only loses itself
+            print(f"Batch failed ({e}); retrying images individually")
+            embeddings = []
+            for _, image_path, img in batch:
+                try:
+                    embeddings.extend(embed_batch([img]))
+                except Exception as e:
+                    print(f"Error processing {image_path}: {e}")
+                    embeddings.append(None)
+
+        for (rel_path, image_path, _), embedding in zip(batch, embeddings):
+            entries[rel_path] = make_entry(image_path, embedding)
+
+    # Loop over decoded images and extract embeddings in batches
+    decode_items = [(rel_path, image_path) for _, rel_path, image_path in to_process]
+    for rel_path, image_path, img in _iter_decoded(decode_items, workers, prefetch=2 * batch_size):
+        processed += 1
+        if img is not None:
+            batch.append((rel_path, image_path, img))
         else:
-            print(f"❌ No valid embeddings for {emp_folder}")
+            # Cache undecodable files too, so they are skipped until they change
+            entries[rel_path] = make_entry(image_path, None)
 
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(pkl_output_path), exist_ok=True)
+        if len(batch) >= batch_size or (processed == len(to_process) and batch):
+            flush(batch)
+            batch = []
 
-    # Save embeddings to .pkl file
-    with open(pkl_output_path, 'wb') as f:
-        pickle.dump(embeddings_dict, f)
+            elapsed = time.perf_counter() - start
+            print(f"[{processed}/{len(to_process)}] {processed / elapsed:.1f} images/s")
 
-    print(f"Embeddings saved to {pkl_output_path}")
+    # Use the average embedding of all images of each employee
+    embeddings_dict = mean_embeddings(people, entries)
+    for person in people:
+        if person in embeddings_dict:
+            print(f"✅ Generated embedding for {person}")
+        else:
+            print(f"❌ No valid embeddings for {person}")
 
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {processed} images in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} images/s)")
 
-if __name__ == "__main__":
-    dataset_path = os.path.join(BASE_DIR, "..", "dataset")
-    pkl_output_path = os.path.join(BASE_DIR, "..", "assets", "embeddings.pkl")
+    # Save embeddings to .pkl file and the memory-mapped gallery the API
+    # loads, then the manifest that produced them
+    gallery_path = os.path.splitext(pkl_output_path)[0] + ".gallery"
+    atomic_pickle_dump(embeddings_dict, pkl_output_path)
+    write_gallery(gallery_path, list(embeddings_dict), list(embeddings_dict.values()))
+    save_manifest(manifest_path, entries)
+
+    print(f"Embeddings saved to {pkl_output_path} and {gallery_path}")
 
-    save_embeddings(dataset_path, pkl_output_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate face embeddings for the dataset")
+    parser.add_argument("--dataset", default=os.path.join(BASE_DIR, "..", "dataset"),
+                        help="Folder with one sub-folder of images per employee")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "..", "assets", "embeddings.pkl"),
+                        help="Output pickle path")
+    parser.add_argument("--workers", type=int, default=4, help="Image decoder threads")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per YOLO / FaceNet batch")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and re-embed every image")
+    args = parser.parse_args()
+
+    save_embeddings(args.dataset, args.output, workers=args.workers, batch_size=args.batch_size,
+                    incremental=not args.full)
     print("Embeddings generation completed.")
@@ -0,0 +1,191 @@
+import numpy as np
+
+
+def top_k(similarities, k):
+    """
+    Select the k most similar columns of each row, sorted best first
+
+    Args:
+        similarities: Array of shape (n, m)
+        k: Number of columns to keep (must be <= m)
+
+    Returns:
+        Tuple of (column indices, similarities), each of shape (n, k)
+    """
+    if k < similarities.shape[1]:
+        # Partial sort: only the top-k columns of each row are ordered
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(similarities.shape[1]), similarities.shape)
+    top_sims = np.take_along_axis(similarities, top, axis=1)
+    order = np.argsort(-top_sims, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+
+
+class ExactIndex:
+    def __init__(self, matrix):
+        """
+        Brute-force inner-product index (one matrix product per query batch)
+
+        Args:
+            matrix: L2-normalised float32 vectors of shape (n, dim)
+        """
+        self.matrix = matrix
+
+    def search(self, queries, k):
+        """
+        Args:
+            queries: L2-normalised float32 queries of shape (q, dim)
+            k: Number of neighbours per query (must be <= len(matrix))
+
+        Returns:
+            Tuple of (row ids, cosine similarities), each of shape (q, k)
+        """
+        return top_k(queries @ self.matrix.T, k)
+
+    def upsert(self, row, vector, matrix):
+        """The matrix is scanned as-is, so only the reference needs updating"""
+        self.matrix = matrix
+
+
+class IVFIndex:
+    def __init__(self, matrix, nlist=0, nprobe=8, n_iter=20, seed=0):
+        """
+        Inverted-file index: vectors are bucketed by their nearest k-means
+        centroid and a query only scans the nprobe closest buckets
+
+        Args:
+            matrix: L2-normalised float32 vectors of shape (n, dim)
+            nlist: Number of buckets (0 picks sqrt(n))
+            nprobe: Buckets scanned per query; higher means better recall,
+                more latency
+            n_iter: k-means iterations used to train the centroids
+            seed: Random seed for centroid initialisation
+        """
+        n = matrix.shape[0]
+        self.matrix = matrix
+        self.nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        self.nprobe = nprobe
+
+        self.centroids = self._train(matrix, self.nlist, n_iter, seed)
+        assignments = np.argmax(matrix @ self.centroids.T, axis=1)
+
+        # Store each bucket as a contiguous slice (CSR layout) so a probe
+        # reads one block of memory instead of gathering scattered rows
+        self.ids = np.argsort(assignments, kind="stable")
+        self.vectors = np.ascontiguousarray(matrix[self.ids])
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        # Where each row lives in self.vectors, for in-place updates
+        self.positions = np.empty(n, dtype=np.int64)
+        self.positions[self.ids] = np.arange(n)
+
+        # Rows added or changed after training are scanned exactly until the
+        # next rebuild; changed rows are masked out of their old bucket.
+        # Extras are kept as one tuple so readers see ids and vectors together
+        self._moved = np.zeros(n, dtype=bool)
+        self._extras = (np.zeros(0, dtype=np.int64), np.zeros((0, matrix.shape[1]), dtype=np.float32))
+
+    @staticmethod
+    def _train(matrix, nlist, n_iter, seed):
+        """Spherical k-means: centroids are kept on the unit sphere"""
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(matrix.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignments = np.argmax(matrix @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, matrix)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+
+            # Keep the previous centroid for buckets that ended up empty
+            empty = norms[:, 0] == 0
+            centroids[~empty] = sums[~empty] / norms[~empty]
+
+        return centroids
+
+    def search(self, queries, k):
+        """
+        Args:
+            queries: L2-normalised float32 queries of shape (q, dim)
+            k: Number of neighbours per query
+
+        Returns:
+            Tuple of (row ids, cosine similarities), each of shape (q, k).
+            Rows with fewer than k candidates are padded with id -1 and
+            similarity -inf.
+        """
+        nprobe = min(self.nprobe, self.nlist)
+        probes, _ = top_k(queries @ self.centroids.T, nprobe)
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        extra_ids, extra_vectors = self._extras
+
+        for row, (query, buckets) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate(
+                [np.arange(self.offsets[b], self.offsets[b + 1]) for b in buckets])
+            candidates = candidates[~self._moved[candidates]]
+            candidate_ids = np.concatenate((self.ids[candidates], extra_ids))
+            if len(candidate_ids) == 0:
+                continue
+
+            candidate_sims = np.concatenate((self.vectors[candidates] @ query, extra_vectors @ query))
+            kk = min(k, len(candidate_ids))
+            best, best_sims = top_k(candidate_sims[None, :], kk)
+            ids[row, :kk] = candidate_ids[best[0]]
+            sims[row, :kk] = best_sims[0]
+
+        return ids, sims
+
+    def upsert(self, row, vector, matrix):
+        """
+        Update or add one row without retraining
+
+        The row is moved out of its bucket (its centroid may no longer fit)
+        and scanned exactly on every query until the next rebuild folds it
+        back into the buckets.
+        """
+        self.matrix = matrix
+
+        extra_ids, extra_vectors = self._extras
+        if row in extra_ids:
+            extra_vectors = extra_vectors.copy()
+            extra_vectors[np.flatnonzero(extra_ids == row)[0]] = vector
+            self._extras = (extra_ids, extra_vectors)
+        else:
+            # Publish the extra copy before hiding the bucket copy so the row
+            # never disappears from results
+            self._extras = (np.append(extra_ids, row), np.vstack((extra_vectors, vector[None, :])))
+            if row < len(self.positions):
+                self._moved[self.positions[row]] = True
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def build_index(matrix, backend="exact", **params):
+    """
+    Build a nearest-neighbour index over L2-normalised vectors
+
+    Args:
+        matrix: L2-normalised float32 vectors of shape (n, dim)
+        backend: Index type ('exact' or 'ivf')
+        **params: Backend-specific options (e.g. nlist, nprobe for 'ivf')
+
+    Returns:
+        Index object exposing search(queries, k)
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose from {list(INDEX_BACKENDS)}")
+
+    # IVF needs at least one vector to train on; fall back to exact search
+    if backend != "exact" and matrix.shape[0] == 0:
+        backend = "exact"
+
+    return INDEX_BACKENDS[backend](matrix, **params)
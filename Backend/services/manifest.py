@@ -0,0 +1,145 @@
+import hashlib
+import os
+import pickle
+import numpy as np
+
+# Bump when the entry layout changes; older manifests are then ignored
+MANIFEST_VERSION = 1
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+
+def manifest_path_for(pkl_output_path):
+    """assets/embeddings.pkl -> assets/embeddings_manifest.pkl"""
+    return os.path.splitext(pkl_output_path)[0] + "_manifest.pkl"
+
+
+def load_manifest(path):
+    """
+    Load the per-image manifest
+
+    Returns:
+        Dict of {relative image path: entry}, where an entry holds the
+        file's size, mtime_ns, sha1 and embedding (None if no face was
+        found). Empty if the file is missing or from another version.
+    """
+    try:
+        with open(path, "rb") as f:
+            manifest = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"Ignoring manifest {path}: unsupported version {manifest.get('version')}")
+        return {}
+    return manifest["images"]
+
+
+def atomic_pickle_dump(obj, path):
+    """Write a pickle to a temporary file and rename it over path"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def save_manifest(path, entries):
+    atomic_pickle_dump({"version": MANIFEST_VERSION, "images": entries}, path)
+
+
+def file_digest(path):
+    """sha1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_entry(path, embedding, digest=None):
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": digest or file_digest(path),
+        "embedding": embedding,
+    }
+
+
+def scan_dataset(dataset_path):
+    """
+    List employee folders and their images
+
+    Returns:
+        Tuple of (people in listing order, list of (person, relative path,
+        absolute path) for every image)
+    """
+    people = []
+    items = []
+    for emp_folder in os.listdir(dataset_path):
+        folder_path = os.path.join(dataset_path, emp_folder)
+        if not os.path.isdir(folder_path):  # Skip if it's not a directory
+            continue
+
+        people.append(emp_folder)
+        for img_name in os.listdir(folder_path):
+            if img_name.endswith(IMAGE_EXTENSIONS):
+                items.append((emp_folder, f"{emp_folder}/{img_name}", os.path.join(folder_path, img_name)))
+    return people, items
+
+
+def find_changes(entries, items):
+    """
+    Compare the dataset against the manifest
+
+    A file whose size and mtime match its entry is assumed unchanged;
+    otherwise its contents are hashed, so touched-but-identical files are
+    not re-embedded.
+
+    Args:
+        entries: Manifest entries (updated in place for touched files and
+            removed files)
+        items: Output of scan_dataset()
+
+    Returns:
+        Tuple of (items to (re-)embed, number of removed images)
+    """
+    current = {rel_path for _, rel_path, _ in items}
+    removed = [rel_path for rel_path in entries if rel_path not in current]
+    for rel_path in removed:
+        del entries[rel_path]
+
+    to_process = []
+    for person, rel_path, path in items:
+        entry = entries.get(rel_path)
+        if entry is not None:
+            stat = os.stat(path)
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+                continue
+
+            digest = file_digest(path)
+            if digest == entry["sha1"]:
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                continue
+
+        to_process.append((person, rel_path, path))
+
+    return to_process, len(removed)
+
+
+def mean_embeddings(people, entries):
+    """
+    Per-person mean embedding from the cached per-image vectors
+
+    Returns:
+        Dict of {person: mean embedding} for people with at least one face
+    """
+    grouped = {person: [] for person in people}
+    for rel_path, entry in entries.items():
+        person = rel_path.split("/", 1)[0]
+        if person in grouped and entry["embedding"] is not None:
+            grouped[person].append(entry["embedding"])
+
+    return {person: np.mean(embeddings, axis=0)
+            for person, embeddings in grouped.items() if embeddings}
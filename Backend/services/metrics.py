@@ -0,0 +1,245 @@
+import bisect
+import functools
+import threading
+import time
+
+# Metrics are process-local and registered by name so modules can look up
+# the same instrument without passing it around; inference workers send their
+# snapshots to the API process, which merges them in with merge()
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Bucket upper bounds (ms) for stage and DB query timings
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Counter:
+    def __init__(self, name, description=""):
+        """Monotonically increasing count"""
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": "counter", "value": self._value}
+
+
+class Gauge:
+    def __init__(self, name, description=""):
+        """Value that can go up and down (queue depth, in-flight requests)"""
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": "gauge", "value": self._value}
+
+
+class Histogram:
+    def __init__(self, name, buckets, description=""):
+        """
+        Distribution of observed values over fixed upper-bound buckets
+
+        Args:
+            name: Metric name
+            buckets: Increasing bucket upper bounds; values above the last
+                bound land in an implicit +Inf bucket
+            description: Human readable description
+        """
+        self.name = name
+        self.description = description
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block in ms"""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "type": "histogram",
+            "buckets": dict(zip(bounds, counts)),
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+        }
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe((time.perf_counter() - self._start) * 1000)
+
+
+def _get_or_create(cls, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, *args, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric '{name}' already registered as {type(metric).__name__}")
+        return metric
+
+
+def counter(name, description=""):
+    return _get_or_create(Counter, name, description=description)
+
+
+def gauge(name, description=""):
+    return _get_or_create(Gauge, name, description=description)
+
+
+def histogram(name, buckets, description=""):
+    return _get_or_create(Histogram, name, buckets, description=description)
+
+
+def snapshot(descriptions=False):
+    """
+    Current value of every registered metric, keyed by name
+
+    Args:
+        descriptions: Also include each metric's description, as needed by
+            render_prometheus() for snapshots taken in another process
+    """
+    with _registry_lock:
+        metrics = dict(_registry)
+
+    snapshots = {}
+    for name, metric in sorted(metrics.items()):
+        snapshots[name] = metric.snapshot()
+        if descriptions:
+            snapshots[name]["description"] = metric.description
+    return snapshots
+
+
+def merge(snapshots):
+    """
+    Combine snapshot() results of several processes into one
+
+    Counters, histogram buckets, counts and sums add up; gauges add up too,
+    so e.g. cache entries become the total over every process.
+    """
+    merged = {}
+    for snaps in snapshots:
+        for name, snap in snaps.items():
+            current = merged.get(name)
+            if current is None:
+                merged[name] = dict(snap, buckets=dict(snap["buckets"])) if "buckets" in snap else dict(snap)
+                continue
+            if current["type"] != snap["type"]:
+                print(f"Metric '{name}' is a {current['type']} in one process and a {snap['type']} "
+                      f"in another; keeping the first")
+                continue
+
+            if snap["type"] == "histogram":
+                for bound, count in snap["buckets"].items():
+                    current["buckets"][bound] = current["buckets"].get(bound, 0) + count
+                current["count"] += snap["count"]
+                current["sum"] += snap["sum"]
+                current["mean"] = current["sum"] / current["count"] if current["count"] else 0.0
+            else:
+                current["value"] += snap["value"]
+            if not current.get("description"):
+                current["description"] = snap.get("description", "")
+    return dict(sorted(merged.items()))
+
+
+def timed(name, description="", buckets=LATENCY_BUCKETS_MS):
+    """
+    Decorator recording the duration of every call in the '<name>_ms' histogram
+
+    The histogram is looked up once, when the function is decorated, so a
+    call costs two perf_counter() reads and one observe().
+    """
+    def decorator(fn):
+        hist = histogram(f"{name}_ms", buckets, description)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe((time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+
+def _help_text(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def render_prometheus(extra_snapshots=()):
+    """
+    Every registered metric in the Prometheus text exposition format
+
+    Args:
+        extra_snapshots: snapshot(descriptions=True) results of other
+            processes (inference workers) to merge in
+    """
+    lines = []
+    for name, snap in merge([snapshot(descriptions=True), *extra_snapshots]).items():
+        if snap.get("description"):
+            lines.append(f"# HELP {name} {_help_text(snap['description'])}")
+        lines.append(f"# TYPE {name} {snap['type']}")
+        if snap["type"] != "histogram":
+            lines.append(f"{name} {snap['value']}")
+            continue
+
+        # Prometheus buckets are cumulative
+        cumulative = 0
+        for bound, count in snap["buckets"].items():
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum {snap['sum']}")
+        lines.append(f"{name}_count {snap['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+"""
+Process-wide registry of the inference models
+
+Each model is loaded on first use, once per process, and shared by every
+module that needs it (API routes, inference workers, generate_embeddings).
+Nothing here imports torch, ultralytics or facenet_pytorch at module level,
+so importing the registry, or modules that only hold a reference to it, is
+cheap.
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets"))
+YOLO_FACE_PATH = os.path.join(ASSETS_DIR, "yolov8n-face.pt")
+
+# Runtime for the detector and embedder: 'torch' (PyTorch / ultralytics) or
+# 'onnx' (ONNX Runtime, see services.onnx_backend)
+INFERENCE_BACKENDS = ("torch", "onnx")
+EMBEDDER_PRECISIONS = ("fp32", "int8")
+_backend = {"name": "torch", "num_threads": 0, "precision": "fp32", "max_accuracy_drop": 0.01}
+
+
+def _resident_bytes():
+    """Current resident set size of this process, or None if unavailable"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _parameter_bytes(model):
+    """Size of a torch module's parameters and buffers, or None for other models"""
+    if not callable(getattr(model, "parameters", None)):
+        return None
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        return total + sum(b.numel() * b.element_size() for b in model.buffers())
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    def __init__(self):
+        """Named model loaders whose results are created once and cached"""
+        self._specs = {}
+        self._models = {}
+        self._stats = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, loader, warmup=None):
+        """
+        Register a model
+
+        Args:
+            name: Registry key
+            loader: Zero-argument callable returning the model
+            warmup: Optional callable(model) running one dummy inference so
+                lazy allocations and kernel selection happen before the
+                first real request
+        """
+        with self._registry_lock:
+            self._specs[name] = (loader, warmup)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """The model registered under name, loading it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._specs:
+            raise KeyError(f"Unknown model '{name}'. Registered: {sorted(self._specs)}")
+
+        # One loader per model; other callers wait for it instead of loading twice
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            loader, _ = self._specs[name]
+            rss_before = _resident_bytes()
+            start = time.perf_counter()
+            model = loader()
+            load_ms = (time.perf_counter() - start) * 1000
+            rss_after = _resident_bytes()
+            param_bytes = _parameter_bytes(model)
+
+            # RSS delta includes libraries imported by the loader (torch is
+            # charged to whichever torch model loads first)
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            self._stats[name] = {
+                "load_ms": round(load_ms, 1),
+                "rss_delta_mb": round(rss_delta / 2 ** 20, 1) if rss_delta is not None else None,
+                "param_mb": round(param_bytes / 2 ** 20, 1) if param_bytes is not None else None,
+                "warmup_ms": None,
+            }
+            self._models[name] = model
+            print(f"Loaded model '{name}' in {load_ms:.0f} ms")
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warmup(self, names=None):
+        """
+        Load and warm up models
+
+        Args:
+            names: Model names; all registered models if None
+        """
+        for name in names or list(self._specs):
+            model = self.get(name)
+            _, warmup = self._specs[name]
+            if warmup is None:
+                continue
+            start = time.perf_counter()
+            warmup(model)
+            self._stats[name]["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def stats(self):
+        """Load time and memory per model; None for models not loaded yet"""
+        return {name: self._stats.get(name) for name in sorted(self._specs)}
+
+
+def set_backend(name, num_threads=0, precision="fp32", max_accuracy_drop=0.01):
+    """
+    Choose the runtime for models that have not been loaded yet
+
+    Args:
+        name: 'torch' or 'onnx'
+        num_threads: ONNX Runtime intra-op threads (0 = all cores)
+        precision: FaceNet precision, 'fp32' or 'int8' (ONNX only)
+        max_accuracy_drop: Largest match-accuracy drop an INT8 model may
+            show in its evaluation report before it is refused
+    """
+    if name not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {INFERENCE_BACKENDS}")
+    if precision not in EMBEDDER_PRECISIONS:
+        raise ValueError(f"Unknown embedder precision '{precision}', expected one of {EMBEDDER_PRECISIONS}")
+    if precision == "int8" and name != "onnx":
+        raise ValueError("The INT8 embedder runs on ONNX Runtime; set the backend to 'onnx'")
+    _backend.update(name=name, num_threads=num_threads, precision=precision, max_accuracy_drop=max_accuracy_drop)
+
+
+def inference_backend():
+    """Name of the configured runtime"""
+    return _backend["name"]
+
+
+def _load_yolo_face():
+    if _backend["name"] == "onnx":
+        from .onnx_backend import OnnxFaceDetector
+        return OnnxFaceDetector(num_threads=_backend["num_threads"])
+
+    from ultralytics import YOLO
+
+    if not os.path.exists(YOLO_FACE_PATH):
+        raise FileNotFoundError(f"YOLOv8 face model not found at {YOLO_FACE_PATH}")
+    return YOLO(YOLO_FACE_PATH)
+
+
+def _warmup_yolo_face(model):
+    model.predict(np.zeros((640, 640, 3), dtype=np.uint8), conf=0.2, verbose=False)
+
+
+def _load_super_resolution():
+    from .super_resolution import SuperResolution
+    return SuperResolution(model_name="espcn", scale=2)
+
+
+def _warmup_super_resolution(model):
+    model.upsample(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+def _load_facenet():
+    if _backend["name"] == "onnx":
+        from .onnx_backend import OnnxEmbedder
+
+        if _backend["precision"] == "int8":
+            from .quantization import FACENET_INT8_PATH, QuantizedModelRejected, check_quantized_model
+            try:
+                report = check_quantized_model(FACENET_INT8_PATH, _backend["max_accuracy_drop"])
+            except QuantizedModelRejected as e:
+                # Never serve an unvetted model; fall back to full precision
+                print(f"Refusing INT8 FaceNet: {e}. Using the fp32 model.")
+            else:
+                print(f"Using INT8 FaceNet (accuracy drop {report['accuracy_drop']:.2%}, "
+                      f"{report['speedup']:.2f}x faster)")
+                return OnnxEmbedder(FACENET_INT8_PATH, num_threads=_backend["num_threads"])
+
+        return OnnxEmbedder(num_threads=_backend["num_threads"])
+
+    from facenet_pytorch import InceptionResnetV1
+    return InceptionResnetV1(pretrained='vggface2').eval()
+
+
+def _warmup_facenet(model):
+    if _backend["name"] == "onnx":
+        model(np.zeros((1, 3, 160, 160), dtype=np.float32))
+        return
+
+    import torch
+    with torch.no_grad():
+        model(torch.zeros((1, 3, 160, 160)))
+
+
+registry = ModelRegistry()
+registry.register("yolo_face", _load_yolo_face, _warmup_yolo_face)
+registry.register("super_resolution", _load_super_resolution, _warmup_super_resolution)
+registry.register("facenet", _load_facenet, _warmup_facenet)
+
+
+def get_model(name):
+    """Shortcut for registry.get(name)"""
+    return registry.get(name)
+
+
+@lru_cache(maxsize=1)
+def face_transform():
+    """Transform function to prepare face image for FaceNet"""
+    from torchvision import transforms
+
+    return transforms.Compose([
+        transforms.Resize((160, 160)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
+    ])
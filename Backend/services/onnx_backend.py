@@ -0,0 +1,322 @@
+"""
+ONNX Runtime backend for the face detector and embedder
+
+The PyTorch models are exported once to ONNX and then run with ONNX
+Runtime's full graph optimisations and a fixed intra-op thread count. The
+runtime classes here only need onnxruntime, NumPy, OpenCV and Pillow; torch
+and ultralytics are imported for export and the parity check only.
+
+Usage (from Backend/):
+    python -m services.onnx_backend export              # both models
+    python -m services.onnx_backend export --models facenet
+    python -m services.onnx_backend check --limit 64    # torch vs ONNX parity
+"""
+import argparse
+import os
+import shutil
+import sys
+import cv2
+import numpy as np
+from PIL import Image
+
+ONNX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets", "onnx"))
+FACENET_ONNX_PATH = os.path.join(ONNX_DIR, "facenet_vggface2.onnx")
+YOLO_FACE_ONNX_PATH = os.path.join(ONNX_DIR, "yolov8n-face.onnx")
+
+# Detector input size the YOLO graph is exported with
+YOLO_INPUT_SIZE = 640
+
+
+def create_session(path, num_threads=0):
+    """
+    ONNX Runtime CPU session with all graph optimisations enabled
+
+    Args:
+        path: .onnx model file
+        num_threads: Intra-op threads; 0 lets ONNX Runtime use every core
+    """
+    import onnxruntime as ort
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ONNX model not found at {path}. "
+                                f"Export it with: python -m services.onnx_backend export")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = num_threads
+    # One process may hold several sessions; spinning threads would fight
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def facenet_input(face_imgs):
+    """
+    NumPy equivalent of recognition's torchvision transform
+
+    Resize((160, 160)) on a PIL image, ToTensor() and Normalize(0.5, 0.5).
+
+    Args:
+        face_imgs: List of cropped RGB faces (numpy arrays or PIL Images)
+
+    Returns:
+        float32 array of shape (n, 3, 160, 160)
+    """
+    batch = np.empty((len(face_imgs), 3, 160, 160), dtype=np.float32)
+    for i, face in enumerate(face_imgs):
+        if not isinstance(face, Image.Image):
+            face = Image.fromarray(face)
+        resized = np.asarray(face.convert("RGB").resize((160, 160), Image.BILINEAR), dtype=np.float32)
+        batch[i] = (resized / 127.5 - 1.0).transpose(2, 0, 1)
+    return batch
+
+
+class OnnxEmbedder:
+    def __init__(self, path=FACENET_ONNX_PATH, num_threads=0):
+        """FaceNet (InceptionResnetV1, vggface2) on ONNX Runtime"""
+        self.path = path
+        self.session = create_session(path, num_threads)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        """Embeddings for a preprocessed (n, 3, 160, 160) float32 batch"""
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def embed(self, face_imgs):
+        """
+        Embed cropped RGB faces
+
+        Returns:
+            Array of shape (len(face_imgs), 512)
+        """
+        if len(face_imgs) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        return self(facenet_input(face_imgs))
+
+
+class OnnxFaceDetector:
+    def __init__(self, path=YOLO_FACE_ONNX_PATH, num_threads=0, imgsz=YOLO_INPUT_SIZE, iou=0.7, max_det=300,
+                 stride=32):
+        """
+        YOLOv8-face on ONNX Runtime
+
+        predict() mirrors ultralytics' YOLO.predict() closely enough for
+        services.detection: it letterboxes, runs the graph and applies NMS,
+        returning one (k, 4) xyxy array per frame in frame coordinates.
+        Like ultralytics with a .pt model, frames of equal shape are padded
+        only up to a multiple of the stride (the graph has dynamic spatial
+        axes), and at most max_det boxes are kept per frame.
+        """
+        self.path = path
+        self.session = create_session(path, num_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+        self.iou = iou
+        self.max_det = max_det
+        self.stride = stride
+
+    def _letterbox(self, frame, rect=False):
+        """
+        Resize keeping aspect ratio and pad with grey 114, like ultralytics
+
+        Pads to imgsz x imgsz, or with rect only to the next multiple of the
+        stride (ultralytics' LetterBox(auto=True)).
+        """
+        h, w = frame.shape[:2]
+        ratio = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = round(w * ratio), round(h * ratio)
+        pad_x, pad_y = self.imgsz - new_w, self.imgsz - new_h
+        if rect:
+            pad_x, pad_y = pad_x % self.stride, pad_y % self.stride
+
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else frame
+        top, left = round(pad_y / 2 - 0.1), round(pad_x / 2 - 0.1)
+        padded = cv2.copyMakeBorder(resized, top, pad_y - top, left, pad_x - left,
+                                    cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return padded, ratio, (left, top)
+
+    def predict(self, frames, conf=0.2, verbose=False):
+        """
+        Detect faces in BGR frames
+
+        Args:
+            frames: BGR frame or list of BGR frames
+            conf: Confidence threshold
+            verbose: Ignored; accepted for YOLO.predict() compatibility
+
+        Returns:
+            List with one float32 (k, 4) xyxy array per frame
+        """
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        if len(frames) == 0:
+            return []
+
+        rect = len({frame.shape for frame in frames}) == 1
+        batch, transforms = None, []
+        for i, frame in enumerate(frames):
+            padded, ratio, offset = self._letterbox(frame, rect)
+            if batch is None:
+                batch = np.empty((len(frames), 3, *padded.shape[:2]), dtype=np.float32)
+            # BGR HWC uint8 -> RGB CHW float in [0, 1]
+            batch[i] = padded[:, :, ::-1].transpose(2, 0, 1) / 255.0
+            transforms.append((ratio, offset, frame.shape[:2]))
+
+        # (n, 4 + 1 + keypoints, anchors): cx, cy, w, h, face score, ...
+        outputs = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(output, conf, *transform) for output, transform in zip(outputs, transforms)]
+
+    def _postprocess(self, output, conf, ratio, offset, shape):
+        scores = output[4]
+        keep = scores > conf
+        if not keep.any():
+            return np.zeros((0, 4), dtype=np.float32)
+
+        cx, cy, w, h = output[:4, keep]
+        scores = scores[keep]
+        boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), conf, self.iou)
+        # Kept indices come back by descending score
+        boxes = boxes[np.asarray(indices, dtype=np.int64).reshape(-1)[:self.max_det]]
+
+        # Undo the letterbox
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = (boxes[:, 0] - offset[0]) / ratio
+        xyxy[:, 1] = (boxes[:, 1] - offset[1]) / ratio
+        xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] - offset[0]) / ratio
+        xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] - offset[1]) / ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return xyxy.astype(np.float32)
+
+
+def export_facenet(path=FACENET_ONNX_PATH, opset=17):
+    """Export the registry's FaceNet to ONNX with a dynamic batch axis"""
+    import torch
+    from .model_registry import get_model
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model = get_model("facenet")
+    torch.onnx.export(model, torch.zeros((1, 3, 160, 160)), path, opset_version=opset,
+                      input_names=["faces"], output_names=["embeddings"],
+                      dynamic_axes={"faces": {0: "batch"}, "embeddings": {0: "batch"}})
+    return path
+
+
+def export_yolo_face(path=YOLO_FACE_ONNX_PATH, opset=17):
+    """Export YOLOv8-face to ONNX (dynamic batch, 640x640 input)"""
+    from ultralytics import YOLO
+    from .model_registry import YOLO_FACE_PATH
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A fresh YOLO object: exporting switches the model into export mode
+    exported = YOLO(YOLO_FACE_PATH).export(format="onnx", imgsz=YOLO_INPUT_SIZE, dynamic=True,
+                                           simplify=True, opset=opset)
+    shutil.move(exported, path)
+    return path
+
+
+def _sample_faces(dataset_path, limit):
+    """Face crops and frames from the dataset, detected with the torch YOLO"""
+    from .manifest import scan_dataset
+    from .model_registry import get_model
+
+    yolo_model = get_model("yolo_face")
+    frames, faces = [], []
+    for _, _, path in sorted(scan_dataset(dataset_path)[1])[:limit]:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        result = yolo_model.predict(frame, conf=0.2, verbose=False)[0]
+        boxes = result.boxes.xyxy.cpu().numpy()
+        frames.append(frame)
+        if len(boxes):
+            x1, y1, x2, y2 = map(int, max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1])))
+            faces.append(cv2.cvtColor(frame[max(0, y1):y2, max(0, x1):x2], cv2.COLOR_BGR2RGB))
+    return frames, faces
+
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def check_parity(dataset_path, limit=64, num_threads=0, tolerance=1e-3, min_iou=0.9):
+    """
+    Compare the ONNX models against the torch models on dataset images
+
+    Embeddings are L2-normalised before comparing, as they are for matching.
+    Each frame is also detected on at 16:9, so letterbox padding is covered.
+
+    Returns:
+        True if every embedding is within tolerance (Euclidean distance) and
+        every largest-face box overlaps the torch box by at least min_iou
+    """
+    from .model_registry import get_model
+    from .recognition import embed_faces
+
+    frames, faces = _sample_faces(dataset_path, limit)
+    if not faces:
+        print(f"No faces found in {dataset_path}")
+        return False
+
+    torch_emb = embed_faces(faces)
+    onnx_emb = OnnxEmbedder(num_threads=num_threads).embed(faces)
+    torch_emb /= np.linalg.norm(torch_emb, axis=1, keepdims=True)
+    onnx_emb /= np.linalg.norm(onnx_emb, axis=1, keepdims=True)
+    distances = np.linalg.norm(torch_emb - onnx_emb, axis=1)
+    print(f"Embedder: {len(faces)} faces, max distance {distances.max():.2e}, "
+          f"mean {distances.mean():.2e} (tolerance {tolerance:.0e})")
+
+    detector = OnnxFaceDetector(num_threads=num_threads)
+    yolo_model = get_model("yolo_face")
+    ious, missed = [], 0
+    frames = frames + [cv2.resize(frame, (640, 360)) for frame in frames]
+    for frame in frames:
+        torch_boxes = yolo_model.predict(frame, conf=0.2, verbose=False)[0].boxes.xyxy.cpu().numpy()
+        onnx_boxes = detector.predict(frame, conf=0.2)[0]
+        if len(torch_boxes) != len(onnx_boxes) and (len(torch_boxes) == 0 or len(onnx_boxes) == 0):
+            missed += 1
+            continue
+        if len(torch_boxes):
+            largest = lambda boxes: max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+            ious.append(_iou(largest(torch_boxes), largest(onnx_boxes)))
+    min_seen = min(ious) if ious else 1.0
+    print(f"Detector: {len(frames)} frames, {missed} with a face in only one backend, "
+          f"min largest-box IoU {min_seen:.3f} (required {min_iou})")
+
+    return bool(distances.max() <= tolerance and missed == 0 and min_seen >= min_iou)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Export the torch models to ONNX")
+    export.add_argument("--models", nargs="+", choices=["facenet", "yolo_face"], default=["facenet", "yolo_face"])
+    export.add_argument("--opset", type=int, default=17)
+
+    check = subparsers.add_parser("check", help="Compare ONNX and torch outputs on dataset images")
+    check.add_argument("--dataset", default="dataset")
+    check.add_argument("--limit", type=int, default=64)
+    check.add_argument("--threads", type=int, default=0)
+    check.add_argument("--tolerance", type=float, default=1e-3,
+                       help="Maximum distance between normalised embeddings")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        if "facenet" in args.models:
+            print(f"FaceNet exported to {export_facenet(opset=args.opset)}")
+        if "yolo_face" in args.models:
+            print(f"YOLOv8-face exported to {export_yolo_face(opset=args.opset)}")
+    else:
+        ok = check_parity(args.dataset, args.limit, args.threads, args.tolerance)
+        print("Parity OK" if ok else "Parity FAILED")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
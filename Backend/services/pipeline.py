@@ -0,0 +1,238 @@
+import time
+import numpy as np
+from .detection import detect_all_faces_batch, detect_faces_batch
+from .recognition import embed_faces
+from .result_cache import dhash
+from .utils import decode_frame, decode_upload, scale_box
+
+
+class RecognitionPipeline:
+    def __init__(self, gallery, apply_sr=True, sr_min_face=0, face_cache=None):
+        """
+        Single-pass recognition pipeline: detect once, embed the crop, match
+
+        Frames are BGR, as decoded by OpenCV, so they go into YOLO without a
+        colour conversion; only the small face crops are converted to RGB.
+
+        Args:
+            gallery: EmbeddingGallery, or GalleryManager for a hot-reloadable one
+            apply_sr: Whether to apply super-resolution before detection
+            sr_min_face: Adaptive SR: detect on the native frame and only
+                super-resolve faces smaller than this many pixels (or frames
+                with no detection); 0 super-resolves every frame
+            face_cache: Optional FaceEmbeddingCache; crops that look like a
+                recently embedded one of about the same size reuse its
+                embedding
+        """
+        self.gallery = gallery
+        self.apply_sr = apply_sr
+        self.sr_min_face = sr_min_face
+        self.face_cache = face_cache
+
+    # Decoding does not touch the models; exposed here for convenience
+    decode = staticmethod(decode_frame)
+    prepare = staticmethod(decode_upload)
+
+    def run_batch(self, images, timings=None):
+        """
+        Recognize the largest face in each of several BGR frames
+
+        Detection and embedding each run as one batched call; stage timings
+        are for the whole batch and are recorded against every item.
+
+        Args:
+            images: List of BGR frames
+            timings: Optional list of per-image timings dicts to extend
+
+        Returns:
+            List of dicts with identity, distance, box, embedding and
+            per-stage timings (milliseconds). identity and box are None
+            if no face was detected.
+        """
+        timings = [{} for _ in images] if timings is None else timings
+        results = [{"identity": None, "distance": None, "box": None,
+                    "embedding": None, "timings": t} for t in timings]
+        stages = {"batch_size": len(images)}
+
+        # Step 1: Detect each face once and keep both the box and the crop
+        start = time.perf_counter()
+        detections = detect_faces_batch(images, apply_sr=self.apply_sr, sr_min_face=self.sr_min_face,
+                                        bgr=True)
+        stages["detect_ms"] = (time.perf_counter() - start) * 1000
+
+        found = [i for i, (face_img, _) in enumerate(detections) if face_img is not None]
+        if found:
+            # Step 2: Embed the crops directly (no second detection pass)
+            start = time.perf_counter()
+            embeddings = self._embed([detections[i][0] for i in found])
+            stages["embed_ms"] = (time.perf_counter() - start) * 1000
+
+            # Step 3: Match against the gallery
+            start = time.perf_counter()
+            identities, distances = self.gallery.match(embeddings)
+            stages["match_ms"] = (time.perf_counter() - start) * 1000
+
+            for row, i in enumerate(found):
+                results[i].update(identity=identities[row], distance=distances[row],
+                                  box=[int(v) for v in detections[i][1]],
+                                  embedding=embeddings[row])
+
+        for t in timings:
+            t.update(stages)
+            t["total_ms"] = sum(v for k, v in t.items() if k.endswith("_ms") and k != "total_ms")
+        return results
+
+    def embed_batch(self, images, timings=None):
+        """
+        Detect and embed the largest face in each of several BGR frames
+
+        Used for enrollment: the gallery is not consulted and the face cache
+        is bypassed, so every embedding comes from its own crop.
+
+        Args:
+            images: List of BGR frames
+            timings: Optional list of per-image timings dicts to extend
+
+        Returns:
+            List of dicts with box, embedding and per-stage timings; box and
+            embedding are None if no face was detected
+        """
+        timings = [{} for _ in images] if timings is None else timings
+        results = [{"box": None, "embedding": None, "timings": t} for t in timings]
+        stages = {"batch_size": len(images)}
+
+        start = time.perf_counter()
+        detections = detect_faces_batch(images, apply_sr=self.apply_sr, sr_min_face=self.sr_min_face,
+                                        bgr=True)
+        stages["detect_ms"] = (time.perf_counter() - start) * 1000
+
+        found = [i for i, (face_img, _) in enumerate(detections) if face_img is not None]
+        if found:
+            start = time.perf_counter()
+            embeddings = embed_faces([detections[i][0] for i in found])
+            stages["embed_ms"] = (time.perf_counter() - start) * 1000
+            for row, i in enumerate(found):
+                results[i].update(box=[int(v) for v in detections[i][1]], embedding=embeddings[row])
+
+        for t in timings:
+            t.update(stages)
+            t["total_ms"] = sum(v for k, v in t.items() if k.endswith("_ms") and k != "total_ms")
+        return results
+
+    def _embed(self, faces):
+        """embed_faces(), skipping crops the face cache has seen"""
+        if self.face_cache is None:
+            return embed_faces(faces)
+
+        hashes = [dhash(face) for face in faces]
+        cached = [self.face_cache.get(face_hash, face.shape[:2]) for face_hash, face in zip(hashes, faces)]
+        missing = [j for j, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            computed = embed_faces([faces[j] for j in missing])
+            for j, embedding in zip(missing, computed):
+                self.face_cache.put(hashes[j], faces[j].shape[:2], embedding)
+                cached[j] = embedding
+        return np.stack(cached)
+
+    def detect_all(self, image):
+        """Every face in a BGR frame as (RGB crop, box) tuples, largest first"""
+        return detect_all_faces_batch([image], apply_sr=self.apply_sr, sr_min_face=self.sr_min_face,
+                                      bgr=True)[0]
+
+    def identify(self, faces):
+        """
+        Embed face crops in one batch and match them against the gallery
+
+        Returns:
+            Tuple of (identities, distances, embeddings)
+        """
+        embeddings = self._embed(faces)
+        identities, distances = self.gallery.match(embeddings)
+        return identities, distances, embeddings
+
+    def run_multi_batch(self, images, timings=None):
+        """
+        Recognize every face in each of several BGR frames
+
+        All crops from all frames go through the embedder in one batched
+        forward pass and are matched together.
+
+        Args:
+            images: List of BGR frames
+            timings: Optional list of per-image timings dicts to extend
+
+        Returns:
+            List of dicts with 'faces' (identity, distance and box per face,
+            largest first; empty if none was detected) and per-stage timings
+        """
+        timings = [{} for _ in images] if timings is None else timings
+        stages = {"batch_size": len(images)}
+
+        start = time.perf_counter()
+        detections = detect_all_faces_batch(images, apply_sr=self.apply_sr, sr_min_face=self.sr_min_face,
+                                            bgr=True)
+        stages["detect_ms"] = (time.perf_counter() - start) * 1000
+
+        crops = [face_img for faces in detections for face_img, _ in faces]
+        stages["faces"] = len(crops)
+        identities, distances = [], []
+        if crops:
+            start = time.perf_counter()
+            embeddings = self._embed(crops)
+            stages["embed_ms"] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            identities, distances = self.gallery.match(embeddings)
+            stages["match_ms"] = (time.perf_counter() - start) * 1000
+
+        results = []
+        matches = iter(zip(identities, distances))
+        for faces, t in zip(detections, timings):
+            t.update(stages)
+            t["total_ms"] = sum(v for k, v in t.items() if k.endswith("_ms") and k != "total_ms")
+            results.append({
+                "faces": [{"identity": identity, "distance": None if distance is None else float(distance), "box": [int(v) for v in box]}
+                          for (_, box), (identity, distance) in zip(faces, matches)],
+                "timings": t,
+            })
+        return results
+
+    def run_multi(self, image, timings=None):
+        """
+        Recognize every face in a BGR frame
+
+        Returns:
+            Same dict as one entry of run_multi_batch()
+        """
+        return self.run_multi_batch([image], None if timings is None else [timings])[0]
+
+    def run(self, image, timings=None):
+        """
+        Recognize the largest face in a BGR frame
+
+        Args:
+            image: Input BGR frame
+            timings: Optional dict of stage timings to extend (milliseconds)
+
+        Returns:
+            Same dict as one entry of run_batch()
+        """
+        return self.run_batch([image], None if timings is None else [timings])[0]
+
+    def run_bytes(self, image_bytes):
+        """
+        Decode and recognize an uploaded image
+
+        Args:
+            image_bytes: Raw encoded image
+
+        Returns:
+            Same dict as run() with the box in the upload's coordinates, or
+            None if the image could not be decoded
+        """
+        image, timings = self.prepare(image_bytes)
+        if image is None:
+            return None
+        result = self.run(image, timings)
+        result["box"] = scale_box(result["box"], timings["decode_scale"])
+        return result
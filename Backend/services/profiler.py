@@ -0,0 +1,178 @@
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Threads whose innermost frame is in one of these modules are waiting, not working
+_IDLE_MODULES = ("threading", "queue", "selectors", "asyncio.base_events")
+
+# Library call on a source line, e.g. "cv2.resize(" or "F.conv2d("
+_NATIVE_CALL = re.compile(r"\b(cv2|cv|torch|F|np|numpy|ort|onnxruntime)\.([A-Za-z_][\w.]*)\s*\(")
+_NATIVE_ALIASES = {"cv": "cv2", "F": "torch.nn.functional", "np": "numpy", "ort": "onnxruntime"}
+
+
+class ProfilerBusy(RuntimeError):
+    """A profiling session is already running"""
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir="profiles", packages=("services", "routes")):
+        """
+        Low-overhead sampling profiler writing collapsed stacks
+
+        While a session runs, a background thread snapshots the stack of
+        every other thread at a fixed interval (sys._current_frames()) and
+        counts identical stacks. Only stacks that pass through one of
+        `packages` are kept, so idle server threads and the event loop do
+        not drown out the recognition work. Time inside OpenCV / torch /
+        ONNX Runtime native code is attributed to a "[native] cv2.resize"
+        style leaf parsed from the calling source line.
+
+        The output is one "frame;frame;...;leaf count" line per stack, the
+        collapsed format read by flamegraph.pl, inferno and speedscope.
+
+        Args:
+            output_dir: Folder for the .collapsed files
+            packages: Top-level packages whose frames mark a stack as relevant
+        """
+        self.output_dir = output_dir
+        self.packages = tuple(packages)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._native_labels = {}
+
+        self.running = False
+        self.session = None
+        self.last_output = None
+
+    def start(self, requests=0, seconds=0.0, interval_ms=5.0):
+        """
+        Start a session that ends after `requests` recognitions or `seconds`
+
+        Whichever limit is reached first ends the session; at least one
+        must be set.
+
+        Raises:
+            ProfilerBusy: A session is already running
+        """
+        if not requests and not seconds:
+            raise ValueError("Set requests and/or seconds")
+
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("A profiling session is already running")
+            self._stop.clear()
+            self.session = {
+                "started": time.time(),
+                "requests_limit": requests,
+                "seconds_limit": seconds,
+                "interval_ms": interval_ms,
+                "requests": 0,
+                "samples": 0,
+                "stacks": Counter(),
+            }
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def request_done(self):
+        """Count one finished request; ends the session at its request limit"""
+        if not self.running:
+            return
+        with self._lock:
+            session = self.session
+            session["requests"] += 1
+            if session["requests_limit"] and session["requests"] >= session["requests_limit"]:
+                self._stop.set()
+
+    def stop(self):
+        """End the running session now and write its output"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.status()
+
+    def status(self):
+        session = self.session
+        if session is None:
+            return {"running": False, "last_output": self.last_output}
+        return {
+            "running": self.running,
+            "requests": session["requests"],
+            "requests_limit": session["requests_limit"],
+            "seconds_limit": session["seconds_limit"],
+            "elapsed_s": round(time.time() - session["started"], 1),
+            "samples": session["samples"],
+            "stacks": len(session["stacks"]),
+            "last_output": self.last_output,
+        }
+
+    def _run(self):
+        session = self.session
+        interval = session["interval_ms"] / 1000
+        deadline = time.monotonic() + session["seconds_limit"] if session["seconds_limit"] else None
+        own_id = threading.get_ident()
+
+        try:
+            while not self._stop.wait(interval):
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                self._sample(session, own_id)
+        finally:
+            path = self._write(session)
+            with self._lock:
+                self.last_output = path
+                self.running = False
+                self._thread = None
+            print(f"Profiler wrote {session['samples']} samples to {path}")
+
+    def _sample(self, session, own_id):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            leaf_module = frame.f_globals.get("__name__", "")
+            if leaf_module.startswith(_IDLE_MODULES):
+                continue
+
+            stack = [self._native_label(frame)]
+            relevant = False
+            while frame is not None:
+                module = frame.f_globals.get("__name__", "?")
+                relevant = relevant or module.split(".", 1)[0] in self.packages
+                stack.append(f"{module}:{frame.f_code.co_name}")
+                frame = frame.f_back
+
+            if relevant:
+                session["stacks"][";".join(reversed([label for label in stack if label]))] += 1
+                session["samples"] += 1
+
+    def _native_label(self, frame):
+        """'[native] cv2.resize' if the leaf line calls into a library, else None"""
+        key = (frame.f_code.co_filename, frame.f_lineno)
+        label = self._native_labels.get(key, False)
+        if label is False:
+            match = _NATIVE_CALL.search(linecache.getline(*key))
+            label = None
+            if match:
+                label = f"[native] {_NATIVE_ALIASES.get(match.group(1), match.group(1))}.{match.group(2)}"
+            self._native_labels[key] = label
+        return label
+
+    def _write(self, session):
+        os.makedirs(self.output_dir, exist_ok=True)
+        started = datetime.fromtimestamp(session["started"]).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.output_dir, f"recognize_{started}.collapsed")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            for stack, count in sorted(session["stacks"].items()):
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+        return path
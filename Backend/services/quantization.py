@@ -0,0 +1,287 @@
+"""
+INT8 FaceNet embedder: calibration, evaluation and the deployment guardrail
+
+The quantised model is derived from the exported fp32 ONNX model
+(python -m services.onnx_backend export). Static quantisation calibrates
+activation ranges on face crops from the dataset; dynamic quantisation needs
+no calibration data but leaves activations in float.
+
+`evaluate` writes a report next to the model with match accuracy at the
+predict_face threshold for both models. The model registry only loads an
+INT8 model whose report matches the file and whose accuracy drop is within
+the configured margin.
+
+Usage (from Backend/):
+    python -m services.quantization calibrate --limit 200
+    python -m services.quantization calibrate --mode dynamic
+    python -m services.quantization evaluate --max-drop 0.01
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from .onnx_backend import FACENET_ONNX_PATH, OnnxEmbedder, facenet_input
+
+FACENET_INT8_PATH = os.path.splitext(FACENET_ONNX_PATH)[0] + ".int8.onnx"
+
+# Distance threshold used by predict_face and the gallery
+MATCH_THRESHOLD = 0.8
+
+
+class QuantizedModelRejected(RuntimeError):
+    """The INT8 model has no valid evaluation report or loses too much accuracy"""
+
+
+def report_path_for(model_path):
+    """assets/onnx/facenet_vggface2.int8.onnx -> assets/onnx/facenet_vggface2.int8.report.json"""
+    return os.path.splitext(model_path)[0] + ".report.json"
+
+
+def dataset_faces(dataset_path, limit=0, seed=0):
+    """
+    Largest face crop of dataset images, detected with the registry's YOLO
+
+    Args:
+        dataset_path: Dataset folder (one sub-folder per identity)
+        limit: Random sample of this many images; 0 uses all
+        seed: Sampling seed
+
+    Returns:
+        Tuple of (RGB face crops, identity label per crop)
+    """
+    from .detection import detect_faces_batch
+    from .manifest import scan_dataset
+
+    _, items = scan_dataset(dataset_path)
+    items = sorted(items)
+    if limit and limit < len(items):
+        items = random.Random(seed).sample(items, limit)
+
+    faces, labels = [], []
+    for start in range(0, len(items), 16):
+        chunk = items[start:start + 16]
+        frames = [cv2.imread(path) for _, _, path in chunk]
+        valid = [(person, frame) for (person, _, _), frame in zip(chunk, frames) if frame is not None]
+        detections = detect_faces_batch([frame for _, frame in valid], apply_sr=False, bgr=True)
+        for (person, _), (face, _) in zip(valid, detections):
+            if face is not None:
+                faces.append(face)
+                labels.append(person)
+    return faces, labels
+
+
+def calibrate(dataset_path, output_path=FACENET_INT8_PATH, mode="static", limit=200, batch_size=8, seed=0):
+    """
+    Quantise the fp32 FaceNet ONNX model to INT8
+
+    Args:
+        dataset_path: Dataset folder used for calibration faces
+        output_path: Where to write the INT8 model
+        mode: 'static' (calibrated activations, QDQ format) or 'dynamic'
+        limit: Number of calibration images
+        batch_size: Calibration batch size
+        seed: Sampling seed for the calibration images
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not os.path.exists(FACENET_ONNX_PATH):
+        raise FileNotFoundError(f"fp32 model not found at {FACENET_ONNX_PATH}. "
+                                f"Export it with: python -m services.onnx_backend export --models facenet")
+
+    # Shape inference and graph cleanup make more nodes quantisable
+    prepared_path = f"{output_path}.prep.onnx"
+    quant_pre_process(FACENET_ONNX_PATH, prepared_path)
+
+    try:
+        if mode == "dynamic":
+            # Convs become ConvInteger, whose CPU kernel only takes uint8 weights
+            quantize_dynamic(prepared_path, output_path, weight_type=QuantType.QUInt8, per_channel=True)
+        else:
+            faces, _ = dataset_faces(dataset_path, limit, seed)
+            if not faces:
+                raise ValueError(f"No faces found in {dataset_path} for calibration")
+            # The histogram calibrator stacks the activations of all batches,
+            # so every batch must have the same size; the remainder is dropped
+            batch_size = min(batch_size, len(faces))
+            faces = faces[:len(faces) - len(faces) % batch_size]
+            print(f"Calibrating on {len(faces)} faces")
+
+            class FaceReader(CalibrationDataReader):
+                def __init__(self):
+                    self._batches = iter(facenet_input(faces[i:i + batch_size])
+                                         for i in range(0, len(faces), batch_size))
+
+                def get_next(self):
+                    batch = next(self._batches, None)
+                    return None if batch is None else {"faces": batch}
+
+            quantize_static(prepared_path, output_path, FaceReader(),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                            calibrate_method=CalibrationMethod.Percentile)
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+
+    # A new model invalidates any previous evaluation
+    if os.path.exists(report_path_for(output_path)):
+        os.remove(report_path_for(output_path))
+    return output_path
+
+
+def _match_accuracy(gallery, embeddings, labels, threshold):
+    """Fraction of faces identified correctly ('Unknown' for people not in the gallery)"""
+    identities, _ = gallery.match(embeddings, threshold=threshold)
+    enrolled = set(gallery.labels.tolist())
+    expected = [label if label in enrolled else "Unknown" for label in labels]
+    return float(np.mean([a == b for a, b in zip(identities, expected)]))
+
+
+def _time_per_face(embedder, faces, batch_size=16, repeats=3):
+    """Best-of-repeats embedding time per face (ms), preprocessing excluded"""
+    batches = [facenet_input(faces[i:i + batch_size]) for i in range(0, len(faces), batch_size)]
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in batches:
+            embedder(batch)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best / len(faces)
+
+
+def evaluate(dataset_path, gallery_path="assets/embeddings.gallery", model_path=FACENET_INT8_PATH,
+             limit=0, num_threads=0, threshold=MATCH_THRESHOLD):
+    """
+    Compare fp32 and INT8 embedders on dataset faces and write the report
+
+    Both models are matched against the stored gallery at the predict_face
+    threshold; the report also records the embedding drift and speedup.
+
+    Returns:
+        The report dict
+    """
+    from .gallery import load_gallery, l2_normalize
+    from .manifest import file_digest
+
+    faces, labels = dataset_faces(dataset_path, limit)
+    if not faces:
+        raise ValueError(f"No faces found in {dataset_path}")
+    gallery = load_gallery(gallery_path)
+
+    fp32 = OnnxEmbedder(FACENET_ONNX_PATH, num_threads)
+    int8 = OnnxEmbedder(model_path, num_threads)
+    fp32_emb = fp32.embed(faces)
+    int8_emb = int8.embed(faces)
+    drift = np.linalg.norm(l2_normalize(fp32_emb) - l2_normalize(int8_emb), axis=1)
+
+    fp32_accuracy = _match_accuracy(gallery, fp32_emb, labels, threshold)
+    int8_accuracy = _match_accuracy(gallery, int8_emb, labels, threshold)
+    fp32_ms = _time_per_face(fp32, faces)
+    int8_ms = _time_per_face(int8, faces)
+
+    report = {
+        "model": os.path.basename(model_path),
+        "model_sha1": file_digest(model_path),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "faces": len(faces),
+        "threshold": threshold,
+        "fp32_accuracy": round(fp32_accuracy, 4),
+        "int8_accuracy": round(int8_accuracy, 4),
+        "accuracy_drop": round(fp32_accuracy - int8_accuracy, 4),
+        "max_embedding_drift": round(float(drift.max()), 4),
+        "mean_embedding_drift": round(float(drift.mean()), 4),
+        "fp32_ms_per_face": round(fp32_ms, 2),
+        "int8_ms_per_face": round(int8_ms, 2),
+        "speedup": round(fp32_ms / int8_ms, 2),
+        "model_mb": round(os.path.getsize(model_path) / 2 ** 20, 1),
+    }
+    with open(report_path_for(model_path), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def check_quantized_model(model_path=FACENET_INT8_PATH, max_accuracy_drop=0.01):
+    """
+    Guardrail: allow an INT8 model only if its evaluation report approves it
+
+    Raises:
+        QuantizedModelRejected: No report, the report is for another file,
+            or the accuracy drop exceeds max_accuracy_drop
+
+    Returns:
+        The report dict
+    """
+    from .manifest import file_digest
+
+    if not os.path.exists(model_path):
+        raise QuantizedModelRejected(f"INT8 model not found at {model_path}")
+
+    report_path = report_path_for(model_path)
+    try:
+        with open(report_path) as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        raise QuantizedModelRejected(f"{model_path} has not been evaluated; "
+                                     f"run python -m services.quantization evaluate")
+
+    if report.get("model_sha1") != file_digest(model_path):
+        raise QuantizedModelRejected(f"{report_path} was written for a different model file; re-run evaluate")
+    if report["accuracy_drop"] > max_accuracy_drop:
+        raise QuantizedModelRejected(f"INT8 accuracy drop {report['accuracy_drop']:.2%} exceeds the allowed "
+                                     f"{max_accuracy_drop:.2%} ({report['fp32_accuracy']:.2%} -> "
+                                     f"{report['int8_accuracy']:.2%} at threshold {report['threshold']})")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calib = subparsers.add_parser("calibrate", help="Quantise the fp32 ONNX FaceNet to INT8")
+    calib.add_argument("--dataset", default="dataset")
+    calib.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    calib.add_argument("--limit", type=int, default=200, help="Calibration images")
+    calib.add_argument("--output", default=FACENET_INT8_PATH)
+
+    evaluation = subparsers.add_parser("evaluate", help="Accuracy / speed report for the INT8 model")
+    evaluation.add_argument("--dataset", default="dataset")
+    evaluation.add_argument("--gallery", default="assets/embeddings.gallery")
+    evaluation.add_argument("--model", default=FACENET_INT8_PATH)
+    evaluation.add_argument("--limit", type=int, default=0, help="Evaluation images (0 = all)")
+    evaluation.add_argument("--threads", type=int, default=0)
+    evaluation.add_argument("--max-drop", type=float, default=0.01,
+                            help="Accuracy drop that fails the evaluation")
+
+    args = parser.parse_args()
+    if args.command == "calibrate":
+        path = calibrate(args.dataset, args.output, args.mode, args.limit)
+        print(f"INT8 model written to {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB); "
+              f"evaluate it before deploying")
+        return
+
+    report = evaluate(args.dataset, args.gallery, args.model, args.limit, args.threads)
+    print(f"Faces: {report['faces']}, threshold {report['threshold']}")
+    print(f"{'':<8}{'accuracy':>10}{'ms/face':>10}")
+    print(f"{'fp32':<8}{report['fp32_accuracy']:>10.4f}{report['fp32_ms_per_face']:>10.2f}")
+    print(f"{'int8':<8}{report['int8_accuracy']:>10.4f}{report['int8_ms_per_face']:>10.2f}")
+    print(f"Accuracy drop {report['accuracy_drop']:+.4f}, speedup {report['speedup']:.2f}x, "
+          f"max embedding drift {report['max_embedding_drift']}")
+    print(f"Report saved to {report_path_for(args.model)}")
+
+    try:
+        check_quantized_model(args.model, args.max_drop)
+    except QuantizedModelRejected as e:
+        print(f"REJECTED: {e}")
+        sys.exit(1)
+    print("Accepted for deployment")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,65 @@
-import cv2
-import torch
 import numpy as np
-import pickle
-from facenet_pytorch import InceptionResnetV1
 from .detection import detect_face  # Your YOLOv8-face detection function
-from PIL import Image
-from torchvision import transforms
+from . import metrics
+from .gallery import EmbeddingGallery
+from .model_registry import face_transform, get_model, inference_backend
 
-# Initialize FaceNet model
-model = InceptionResnetV1(pretrained='vggface2').eval()
 
-# Load embeddings
-with open('assets/embeddings.pkl', 'rb') as f:
-    embeddings_dict = pickle.load(f)
+def __getattr__(name):
+    # The FaceNet model used to be created at import; it now comes from the
+    # model registry
+    if name == "model":
+        return get_model("facenet")
+    if name == "transform":
+        return face_transform()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Transform function to prepare face image for FaceNet
-transform = transforms.Compose([
-    transforms.Resize((160, 160)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-])
+
+facenet_hist = metrics.histogram("stage_facenet_ms", metrics.LATENCY_BUCKETS_MS,
+                                 "FaceNet embedding of one batch of crops, preprocessing included (ms)")
+
+
+def embed_faces(face_imgs):
+    """
+    Generate embeddings for several cropped faces in one forward pass
+
+    Args:
+        face_imgs: List of cropped RGB face images (numpy arrays)
+
+    Returns:
+        Array of shape (len(face_imgs), 512)
+    """
+    if len(face_imgs) == 0:
+        return np.zeros((0, 512), dtype=np.float32)
+
+    model = get_model("facenet")
+    if inference_backend() == "onnx":
+        with facenet_hist.time():
+            return model.embed(face_imgs)
+
+    import torch
+    from PIL import Image
+
+    with facenet_hist.time():
+        # Convert to PIL Images, apply transforms and stack into one batch
+        transform = face_transform()
+        face_tensor = torch.stack([transform(Image.fromarray(face)) for face in face_imgs])
+        with torch.no_grad():
+            embeddings = model(face_tensor)
+        return embeddings.detach().cpu().numpy()
+
+
+def embed_face(face_img):
+    """
+    Generate an embedding for an already-cropped face
+
+    Args:
+        face_img: Cropped RGB face image (numpy array)
+
+    Returns:
+        Face embedding as a flattened numpy array
+    """
+    return embed_faces([face_img])[0]
 
 
 def get_embedding(image):
@@ -27,34 +67,23 @@ def get_embedding(image):
     face_img = detect_face(image)
     if face_img is None:
         return None
-    # Convert to PIL Image
-    face_pil = Image.fromarray(face_img)
-    # Apply transforms
-    face_tensor = transform(face_pil).unsqueeze(0)
-    with torch.no_grad():
-        embedding = model(face_tensor)
-    return embedding.detach().cpu().numpy()[0]  # Return flattened array
+    return embed_face(face_img)
 
 
-def predict_face(embedding, stored_embeddings):
+def predict_face(embedding, stored_embeddings, threshold=0.8):
     """
     Compare the embedding with stored embeddings to find a match
 
     Args:
         embedding: Face embedding of the query face
-        stored_embeddings: Dictionary of stored embeddings
+        stored_embeddings: EmbeddingGallery, or dictionary of stored embeddings
+        threshold: Maximum distance for a match
 
     Returns:
         Identity of the matched face or "Unknown"
     """
-    min_dist = float('inf')
-    identity = "Unknown"
-
-    for name, emb in stored_embeddings.items():
-        dist = np.linalg.norm(embedding - emb)
-        if dist < min_dist and dist < 0.8:  # Threshold can be adjusted
-            min_dist = dist
-            identity = name
-
-    return identity
+    if isinstance(stored_embeddings, dict):
+        stored_embeddings = EmbeddingGallery.from_dict(stored_embeddings)
 
+    identities, _ = stored_embeddings.match(embedding, threshold=threshold)
+    return identities[0]
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from . import metrics
+
+
+class ResultCache:
+    def __init__(self, name, max_entries=1024, ttl=30.0):
+        """
+        Thread-safe LRU cache with per-entry time-to-live
+
+        Args:
+            name: Metric prefix; hits, misses and evictions are counted as
+                <name>_hits_total etc. and the size as <name>_entries
+            max_entries: Least recently used entries are evicted beyond this
+            ttl: Seconds an entry stays valid; 0 keeps entries until evicted
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Bumped by clear(); see put()
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter(f"{name}_hits_total", "Cache lookups answered from the cache")
+        self.misses = metrics.counter(f"{name}_misses_total", "Cache lookups that had to compute the result")
+        self.evictions = metrics.counter(f"{name}_evictions_total", "Entries dropped for size or age")
+        self.size = metrics.gauge(f"{name}_entries", "Entries currently cached")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at, now):
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, key, record=True):
+        """Cached value for key, or None (counted as a hit or a miss if record is set)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._entries[key]
+                self.evictions.inc()
+                self.size.set(len(self._entries))
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses.inc()
+                return None
+
+            self._entries.move_to_end(key)
+            if record:
+                self.hits.inc()
+            return entry[0]
+
+    def put(self, key, value, generation=None):
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+            generation: self.generation read before the value was computed;
+                the value is dropped if clear() ran since, as it may be
+                based on what the clear invalidated
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions.inc()
+            self.size.set(len(self._entries))
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, most recently used last"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, stored_at) in self._entries.items()
+                    if not self._expired(stored_at, now)]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size.set(0)
+
+
+def content_key(data):
+    """Exact cache key for uploaded bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(image, hash_size=8):
+    """
+    64-bit difference hash of an image
+
+    Compares neighbouring pixels of a tiny greyscale thumbnail, so re-encoded
+    or slightly shifted copies of the same crop hash to nearby values.
+
+    Args:
+        image: RGB or greyscale image
+
+    Returns:
+        Hash as a Python int
+    """
+    grey = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(grey, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FaceEmbeddingCache:
+    def __init__(self, max_entries=256, ttl=30.0, max_distance=1, size_tolerance=0.1):
+        """
+        Embeddings of recently seen face crops, looked up by perceptual hash
+
+        A crop whose dHash is within max_distance bits of a cached one, and
+        whose height and width are within size_tolerance of that crop's,
+        reuses its embedding and skips FaceNet. Embeddings do not depend on
+        the gallery, so this cache survives enrollments and reloads.
+
+        A 64-bit dHash of an 8x9 thumbnail says little about identity: two
+        people framed alike can hash a few bits apart, and a reused embedding
+        is then matched as the wrong person. Keep max_distance at 0-1 unless
+        the hit rate has been checked against misidentifications.
+
+        Args:
+            max_entries: LRU size
+            ttl: Seconds an embedding stays valid
+            max_distance: Largest Hamming distance treated as the same face
+            size_tolerance: Largest relative difference in crop height and
+                width treated as the same face
+        """
+        self.max_distance = max_distance
+        self.size_tolerance = size_tolerance
+        self._cache = ResultCache("face_embedding_cache", max_entries, ttl)
+
+    def _same_size(self, a, b):
+        return all(abs(x - y) <= self.size_tolerance * max(x, y) for x, y in zip(a, b))
+
+    def get(self, face_hash, size):
+        """
+        Embedding of the closest cached crop within max_distance, or None
+
+        Args:
+            face_hash: dhash() of the crop
+            size: (height, width) of the crop
+        """
+        entry = self._cache.get(face_hash, record=False)
+        best = entry[1] if entry is not None and self._same_size(entry[0], size) else None
+        if best is None and self.max_distance > 0:
+            best_distance = self.max_distance + 1
+            for key, (cached_size, embedding) in self._cache.items():
+                distance = bin(face_hash ^ key).count("1")
+                if distance < best_distance and self._same_size(cached_size, size):
+                    best, best_distance = embedding, distance
+
+        (self._cache.misses if best is None else self._cache.hits).inc()
+        return best
+
+    def put(self, face_hash, size, embedding):
+        self._cache.put(face_hash, (tuple(size), embedding))
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,99 @@
+import time
+from . import metrics
+from .tracking import FaceTracker, face_quality
+
+stream_frames_counter = metrics.counter("stream_frames_total", "Frames received on recognition streams")
+stream_detect_counter = metrics.counter("stream_detector_runs_total", "Frames on which the detector ran")
+stream_embed_counter = metrics.counter("stream_embeddings_total", "Face crops embedded for stream tracks")
+stream_dropped_counter = metrics.counter("stream_frames_dropped_total",
+                                         "Stream frames skipped because inference was saturated")
+streams_active_gauge = metrics.gauge("streams_active", "Open recognition streams")
+
+
+class StreamSession:
+    def __init__(self, pipeline, detect_every=5, reembed_gain=1.25, iou_threshold=0.3, max_missed=2):
+        """
+        Recognition state for one camera stream
+
+        The detector runs on every detect_every-th frame; in between, faces
+        are followed by a FaceTracker. A tracked face is embedded when it
+        first appears and again only when a crop of clearly better quality
+        (larger, sharper) comes along, so a person walking up to the door
+        costs a handful of FaceNet calls instead of one per frame.
+
+        Args:
+            pipeline: RecognitionPipeline providing detect_all() and identify()
+            detect_every: Run the detector on every N-th frame
+            reembed_gain: Re-embed a track when a crop's face_quality()
+                exceeds its best so far by this factor
+            iou_threshold: See FaceTracker
+            max_missed: See FaceTracker
+        """
+        self.pipeline = pipeline
+        self.detect_every = max(1, detect_every)
+        self.reembed_gain = reembed_gain
+        self.tracker = FaceTracker(iou_threshold, max_missed)
+
+        self.started = time.monotonic()
+        self.frames = 0
+        self.detector_runs = 0
+        self.embeddings = 0
+        self.dropped = 0
+
+    def process(self, image):
+        """
+        Advance the stream by one BGR frame
+
+        Returns:
+            Tuple of (list of Track.to_dict() for the faces in view,
+            stage timings in milliseconds)
+        """
+        self.frames += 1
+        stream_frames_counter.inc()
+        timings = {}
+
+        self.tracker.predict()
+        if (self.frames - 1) % self.detect_every == 0:
+            start = time.perf_counter()
+            faces = self.pipeline.detect_all(image)
+            timings["detect_ms"] = (time.perf_counter() - start) * 1000
+            self.detector_runs += 1
+            stream_detect_counter.inc()
+
+            tracks = self.tracker.update([box for _, box in faces])
+            pending = []
+            for track, (face_img, _) in zip(tracks, faces):
+                quality = face_quality(face_img)
+                if track.embeddings == 0 or quality > track.quality * self.reembed_gain:
+                    pending.append((track, face_img, quality))
+
+            if pending:
+                start = time.perf_counter()
+                identities, distances, _ = self.pipeline.identify([face_img for _, face_img, _ in pending])
+                timings["embed_ms"] = (time.perf_counter() - start) * 1000
+                for (track, _, quality), identity, distance in zip(pending, identities, distances):
+                    track.identity, track.distance = identity, distance
+                    track.quality = quality
+                    track.embeddings += 1
+                self.embeddings += len(pending)
+                stream_embed_counter.inc(len(pending))
+
+        faces = [track.to_dict() for track in self.tracker.tracks if track.misses == 0]
+        return faces, timings
+
+    def drop_frame(self):
+        """Count a frame that was received but not processed"""
+        self.dropped += 1
+        stream_dropped_counter.inc()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "detector_runs": self.detector_runs,
+            "embeddings": self.embeddings,
+            "tracks": len(self.tracker.tracks),
+            "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 1),
+        }
@@ -2,17 +2,55 @@ import cv2
 import os
 import numpy as np
 
+# 'luma' runs the network once on the Y channel of YCrCb and upscales the
+# chroma bicubically; 'per_channel' runs it separately on each colour channel
+SR_MODES = ("luma", "per_channel")
+
+
+def upsample_luma(sr, image, scale, to_ycrcb=cv2.COLOR_BGR2YCrCb, from_ycrcb=cv2.COLOR_YCrCb2BGR):
+    """
+    Super-resolve a colour image with a single call on its luma channel
+
+    ESPCN-style models are trained on luminance, and the eye (and the face
+    detector) get almost all detail from it, so chroma only needs a cheap
+    bicubic resize.
+
+    Args:
+        sr: cv2.dnn_superres model
+        image: 3-channel uint8 image
+        scale: The model's upscaling factor
+        to_ycrcb: Colour conversion into YCrCb (BGR by default)
+        from_ycrcb: Colour conversion back from YCrCb
+
+    Returns:
+        Super-resolved image in the input's colour order
+    """
+    ycrcb = cv2.cvtColor(image, to_ycrcb)
+    h, w = image.shape[:2]
+
+    y_sr = sr.upsample(np.ascontiguousarray(ycrcb[:, :, 0]))
+    chroma = cv2.resize(ycrcb[:, :, 1:], (w * scale, h * scale), interpolation=cv2.INTER_CUBIC)
+
+    return cv2.cvtColor(np.dstack((y_sr, chroma)), from_ycrcb)
+
 
 class SuperResolution:
-    def __init__(self, model_name="espcn", scale=3):
+    def __init__(self, model_name="espcn", scale=3, mode="luma"):
         """
         Initialize super-resolution model
 
         Args:
             model_name: Model architecture ('espcn', 'fsrcnn', or 'lapsrn')
             scale: Upscaling factor (2, 3, 4, or 8 depending on model)
+            mode: Colour handling, 'luma' (one DNN pass) or 'per_channel'
+                (one pass per B/G/R channel)
         """
+        if mode not in SR_MODES:
+            raise ValueError(f"Unknown super-resolution mode '{mode}', expected one of {SR_MODES}")
+
         self.sr = cv2.dnn_superres.DnnSuperResImpl_create()
+        self.scale = scale
+        self.mode = mode
 
         # Define model paths
         models_dir = os.path.join("..", "assets", "sr_models")
@@ -50,12 +88,13 @@ class SuperResolution:
         urllib.request.urlretrieve(model_urls[model_name], self.model_path)
         print(f"Model downloaded to {self.model_path}")
 
-    def upsample(self, image):
+    def upsample(self, image, mode=None):
         """
         Apply super-resolution to an image
 
         Args:
             image: Input image (BGR format)
+            mode: Overrides the instance's colour mode for this call
 
         Returns:
             Super-resolved image
@@ -64,9 +103,11 @@ class SuperResolution:
         if image is None or image.size == 0:
             raise ValueError("Input image is empty or None")
 
-        # Convert to the expected format if needed
-        # The error suggests the model expects 2D input
-        # Try splitting channels and processing separately
+        if len(image.shape) == 3 and (mode or self.mode) == "luma":
+            return upsample_luma(self.sr, image, self.scale)
+
+        # The model expects 2D input, so colour channels are processed
+        # separately
         if len(image.shape) == 3:
             # Split channels
             b, g, r = cv2.split(image)
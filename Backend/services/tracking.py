@@ -0,0 +1,143 @@
+import itertools
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def face_quality(face_img):
+    """
+    Cheap score for how useful a face crop is to the embedder
+
+    The shorter side of the crop, discounted when the crop is blurry
+    (variance of the Laplacian below ~100 is visibly soft).
+
+    Args:
+        face_img: Cropped RGB face
+
+    Returns:
+        Score in pixels; higher is better
+    """
+    grey = cv2.cvtColor(face_img, cv2.COLOR_RGB2GRAY)
+    sharpness = cv2.Laplacian(grey, cv2.CV_64F).var()
+    return min(face_img.shape[:2]) * min(1.0, sharpness / 100.0)
+
+
+class Track:
+    def __init__(self, track_id, box):
+        """
+        One face followed across frames
+
+        Args:
+            track_id: Id unique within the tracker
+            box: (x1, y1, x2, y2) of the first detection
+        """
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float64)
+        self.velocity = np.zeros(4)
+        self.misses = 0
+        self.age = 0
+        self.frames_since_detection = 0
+
+        # Recognition result for the best crop seen so far
+        self.identity = None
+        self.distance = None
+        self.quality = 0.0
+        self.embeddings = 0
+
+    def to_dict(self):
+        return {
+            "track_id": self.track_id,
+            "box": [int(round(v)) for v in self.box],
+            "identity": self.identity,
+            "distance": self.distance,
+            "quality": round(self.quality, 1),
+            "embeddings": self.embeddings,
+            "tracked": self.frames_since_detection > 0,
+        }
+
+
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_missed=2, smoothing=0.5):
+        """
+        IoU tracker with a constant-velocity motion model
+
+        Between detector runs predict() moves every box along its velocity;
+        update() matches fresh detections to the predicted boxes greedily by
+        IoU, starts tracks for unmatched detections and drops tracks that
+        went unmatched for more than max_missed detector runs.
+
+        Args:
+            iou_threshold: Minimum IoU between a prediction and a detection
+                to treat them as the same face
+            max_missed: Detector runs a track may go unmatched
+            smoothing: Weight of the newest displacement in the velocity
+                estimate (1 uses only the last one)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.smoothing = smoothing
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def predict(self):
+        """Advance every track by one frame"""
+        for track in self.tracks:
+            track.box = track.box + track.velocity
+            track.age += 1
+            track.frames_since_detection += 1
+        return self.tracks
+
+    def update(self, boxes):
+        """
+        Associate one frame's detections with the tracks
+
+        Args:
+            boxes: Detected (x1, y1, x2, y2) boxes of the current frame
+
+        Returns:
+            The Track for each detection, in the same order
+        """
+        pairs = sorted(((iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks) for d, box in enumerate(boxes)),
+                       reverse=True)
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used or assigned[d] is not None:
+                continue
+            used.add(t)
+            assigned[d] = self.tracks[t]
+
+        for d, box in enumerate(boxes):
+            box = np.asarray(box, dtype=np.float64)
+            track = assigned[d]
+            if track is None:
+                track = assigned[d] = Track(next(self._ids), box)
+                self.tracks.append(track)
+                continue
+
+            # The prediction already moved the box by velocity per frame, so
+            # the residual corrects the velocity over the frames it covered
+            steps = max(track.frames_since_detection, 1)
+            observed = track.velocity + (box - track.box) / steps
+            track.velocity = self.smoothing * observed + (1 - self.smoothing) * track.velocity
+            track.box = box
+            track.misses = 0
+            track.frames_since_detection = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in used and track.frames_since_detection > 0:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_missed]
+        return assigned
@@ -1,6 +1,132 @@
+import time
 import cv2 as cv
 import numpy as np
+from . import metrics
 from .preprocessing import enhance_image
+
+# YOLOv8 letterboxes every frame to this size, so decoding more pixels than
+# this along the longer side only costs time
+DETECTOR_INPUT_SIZE = 640
+
+decode_hist = metrics.histogram("stage_decode_ms", metrics.LATENCY_BUCKETS_MS, "Upload decode (ms)")
+
+# Scale factors libjpeg can apply while decoding (DCT scaling)
+_REDUCED_FLAGS = ((8, cv.IMREAD_REDUCED_COLOR_8), (4, cv.IMREAD_REDUCED_COLOR_4),
+                  (2, cv.IMREAD_REDUCED_COLOR_2))
+
+# JPEG start-of-frame markers (SOF0-SOF15 minus DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(img_bytes):
+    """
+    Read a JPEG's dimensions from its header without decoding it
+
+    Returns:
+        (width, height), or None if the bytes are not a parsable JPEG
+    """
+    if img_bytes[:2] != b"\xff\xd8":
+        return None
+
+    i = 2
+    while i + 9 <= len(img_bytes):
+        if img_bytes[i] != 0xFF:
+            return None
+        marker = img_bytes[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(img_bytes[i + 5:i + 7], "big")
+            width = int.from_bytes(img_bytes[i + 7:i + 9], "big")
+            return width, height
+        if marker == 0xDA:  # start of scan: no frame header found
+            return None
+        i += 2 + int.from_bytes(img_bytes[i + 2:i + 4], "big")
+    return None
+
+
+def reduced_decode_factor(size, target_size=DETECTOR_INPUT_SIZE):
+    """
+    Largest JPEG decode reduction that keeps the longer side >= target_size
+
+    Args:
+        size: (width, height) of the encoded image, or None
+        target_size: Smallest acceptable longer side; 0 disables reduction
+
+    Returns:
+        1, 2, 4 or 8
+    """
+    if size is None or target_size <= 0:
+        return 1
+    longest = max(size)
+    for factor, _ in _REDUCED_FLAGS:
+        if longest // factor >= target_size:
+            return factor
+    return 1
+
+
+def decode_frame(img_bytes, target_size=DETECTOR_INPUT_SIZE):
+    """
+    Decode uploaded image bytes into a BGR frame, downscaling JPEGs while decoding
+
+    Large JPEGs are decoded directly at 1/2, 1/4 or 1/8 resolution, which
+    skips most of the IDCT and colour work, as long as the longer side stays
+    at least target_size. Other formats are decoded at full size.
+
+    Args:
+        img_bytes: Raw encoded image (JPEG, PNG, ...)
+        target_size: Detector input size; 0 always decodes at full size
+
+    Returns:
+        Tuple of (BGR frame or None, reduction factor applied)
+    """
+    np_arr = np.frombuffer(img_bytes, np.uint8)
+    factor = reduced_decode_factor(jpeg_size(img_bytes), target_size)
+    flag = dict(_REDUCED_FLAGS).get(factor, cv.IMREAD_COLOR)
+    return cv.imdecode(np_arr, flag), factor
+
+
+def scale_box(box, factor):
+    """Map a box from a reduced decode back to the upload's coordinates"""
+    if box is None or factor == 1:
+        return box
+    return [int(v * factor) for v in box]
+
+
+def decode_image(img_bytes):
+    """
+    Decode uploaded image bytes into an RGB image
+
+    Args:
+        img_bytes: Raw encoded image (JPEG, PNG, ...)
+
+    Returns:
+        RGB image or None if the bytes could not be decoded
+    """
+    np_arr = np.frombuffer(img_bytes, np.uint8)
+    img = cv.imdecode(np_arr, cv.IMREAD_COLOR)
+    if img is None:
+        return None
+    return cv.cvtColor(img, cv.COLOR_BGR2RGB)
+
+
+def decode_upload(img_bytes, target_size=DETECTOR_INPUT_SIZE):
+    """
+    Decode an upload for the recognition pipeline and start its timings dict
+
+    Returns:
+        Tuple of (BGR frame or None, timings dict). The timings hold
+        decode_ms and decode_scale, the reduction factor to multiply boxes
+        by (see scale_box)
+    """
+    start = time.perf_counter()
+    frame, factor = decode_frame(img_bytes, target_size)
+    decode_ms = (time.perf_counter() - start) * 1000
+    decode_hist.observe(decode_ms)
+    return frame, {"decode_ms": decode_ms, "decode_scale": factor}
+
+
 def load_image_from_bytes(img_bytes):
     np_arr = np.frombuffer(img_bytes, np.uint8)
     img = cv.imdecode(np_arr, cv.IMREAD_COLOR)
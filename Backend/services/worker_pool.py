@@ -0,0 +1,288 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+
+# Per-process pipeline, created by _init_worker inside each inference worker
+_pipeline = None
+
+# Queue to the API process for this worker's metric snapshots
+_metrics_queue = None
+
+
+def _init_worker(gallery_path, index, index_params, apply_sr, sr_min_face, num_threads, poll_interval,
+                 reload_signal, warmup, backend_options, face_cache_options, metrics_queue):
+    """Set up this worker process; models load on first use unless warmup is set"""
+    global _pipeline, _metrics_queue
+
+    import cv2
+    from .gallery_manager import GalleryManager
+    from .model_registry import registry, set_backend
+    from .pipeline import RecognitionPipeline
+    from .result_cache import FaceEmbeddingCache
+
+    # Each worker gets its own slice of the cores instead of every process
+    # spinning up one intra-op thread per core and fighting over them
+    cv2.setNumThreads(num_threads)
+    set_backend(num_threads=num_threads, **backend_options)
+    if backend_options.get("name", "torch") == "torch":
+        import torch
+        torch.set_num_threads(num_threads)
+
+    # The watcher always runs in workers so admin reload requests (bumps of
+    # reload_signal) are picked up; with polling disabled (0) it only checks
+    # the signal and never the file
+    gallery = GalleryManager(gallery_path, index, index_params, poll_interval=poll_interval or 1.0,
+                             reload_signal=reload_signal, watch_file=poll_interval > 0)
+    face_cache = FaceEmbeddingCache(**face_cache_options) if face_cache_options else None
+    _pipeline = RecognitionPipeline(gallery, apply_sr=apply_sr, sr_min_face=sr_min_face, face_cache=face_cache)
+    _metrics_queue = metrics_queue
+    if warmup:
+        registry.warmup()
+    print(f"Inference worker {os.getpid()} ready ({num_threads} threads)")
+
+
+def _model_stats():
+    """Model registry stats of the worker that runs this"""
+    from .model_registry import registry
+    return {"pid": os.getpid(), "models": registry.stats()}
+
+
+def _run_shared(shm_name, layout, timings, method="run_batch"):
+    """
+    Run a batch whose frames live in a shared memory block
+
+    Args:
+        shm_name: Name of the SharedMemory block written by the API process
+        layout: List of (offset, shape) tuples, one uint8 frame per entry
+        timings: List of per-frame timings dicts
+        method: RecognitionPipeline batch method ('run_batch' or
+            'run_multi_batch')
+
+    Returns:
+        List of result dicts from that method, each with the
+        'gallery_signature' of the gallery it was matched against (None if
+        the gallery was swapped during the batch)
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    images = []
+    try:
+        images = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                  for offset, shape in layout]
+        signature = _pipeline.gallery.signature
+        results = getattr(_pipeline, method)(images, timings)
+        if _pipeline.gallery.signature != signature:
+            signature = None
+        for result in results:
+            result["gallery_signature"] = signature
+        return results
+    finally:
+        # Views into the block must be released before it can be closed, also
+        # when the pipeline raised; otherwise close() raises BufferError and
+        # hides the real error
+        del images
+        shm.close()
+        _publish_metrics()
+
+
+def _publish_metrics():
+    """Send this worker's metrics (stage timings, SR and face cache counters) to the API process"""
+    from . import metrics
+    _metrics_queue.put((os.getpid(), metrics.snapshot(descriptions=True)))
+
+
+class InferenceWorkerPool:
+    def __init__(self, num_workers, gallery_path, index="exact", index_params=None,
+                 apply_sr=True, sr_min_face=0, threads_per_worker=0, poll_interval=0, warmup=False,
+                 backend_options=None, face_cache_options=None):
+        """
+        Pool of inference processes, each owning one YOLO / ESPCN / FaceNet set
+
+        Frames are handed to workers through multiprocessing.shared_memory
+        rather than pickled, so only a small (name, layout) message crosses
+        the process boundary. Exposes the same run() / run_batch() interface
+        as RecognitionPipeline (plus run_multi() / run_multi_batch()), so it
+        can back a MicroBatcher. After every batch a worker sends its metric
+        snapshot back; worker_metrics() returns the latest one per worker.
+        If a worker dies (OOM kill, segfault) the whole pool is replaced
+        with fresh workers and the interrupted batch is retried once.
+
+        Args:
+            num_workers: Number of inference processes
+            gallery_path: Path to the embeddings file each worker loads
+            index: Gallery index backend
+            index_params: Gallery index options
+            apply_sr: Whether to apply super-resolution before detection
+            sr_min_face: Adaptive SR face-size threshold (0 = every frame)
+            threads_per_worker: torch / OpenCV threads per worker
+                (0 splits the available cores evenly)
+            poll_interval: Seconds between gallery file checks in each worker
+            warmup: Load and warm up the models as each worker starts
+            backend_options: model_registry.set_backend() options for the
+                workers (runtime, embedder precision); torch by default
+            face_cache_options: FaceEmbeddingCache options for each worker,
+                or None to embed every crop
+        """
+        self.num_workers = num_workers
+        if not threads_per_worker:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+
+        # spawn: workers must not inherit the API process's torch/OpenMP state
+        context = mp.get_context("spawn")
+        self._reload_signal = context.Value("i", 0)
+        self._metrics_queue = context.Queue()
+        self._worker_metrics = {}
+        self._pool_options = dict(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(gallery_path, index, index_params or {}, apply_sr, sr_min_face, threads_per_worker,
+                      poll_interval, self._reload_signal, warmup,
+                      backend_options or {"name": "torch"}, face_cache_options, self._metrics_queue),
+        )
+        self._pool = ProcessPoolExecutor(**self._pool_options)
+        self._pool_lock = threading.Lock()
+
+        # Snapshots are cumulative, so only the latest one per worker is kept;
+        # draining continuously keeps the queue from growing between scrapes
+        self._metrics_thread = threading.Thread(target=self._collect_metrics, name="worker-metrics", daemon=True)
+        self._metrics_thread.start()
+
+    @staticmethod
+    def _pack(images):
+        """Copy frames into one new shared memory block"""
+        images = [np.ascontiguousarray(image, dtype=np.uint8) for image in images]
+        layout = []
+        offset = 0
+        for image in images:
+            layout.append((offset, image.shape))
+            offset += image.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (offset, shape), image in zip(layout, images):
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)[...] = image
+        return shm, layout
+
+    def submit_batch(self, images, timings=None, method="run_batch"):
+        """
+        Send a batch of BGR frames to one worker
+
+        Args:
+            images: List of BGR frames
+            timings: Optional list of per-image timings dicts
+            method: Pipeline method to run, 'run_batch' or 'run_multi_batch'
+
+        Returns:
+            concurrent.futures.Future resolving to a list of result dicts
+        """
+        timings = [{} for _ in images] if timings is None else timings
+        start = time.perf_counter()
+        shm, layout = self._pack(images)
+        transfer_ms = (time.perf_counter() - start) * 1000
+        for t in timings:
+            t["transfer_ms"] = transfer_ms
+
+        try:
+            future = self._submit(_run_shared, shm.name, layout, timings, method)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def _cleanup(_future):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(_cleanup)
+        return future
+
+    def _submit(self, fn, *args):
+        """Submit to the pool, replacing it first if a worker has died"""
+        pool = self._pool
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            return self._replace_pool(pool).submit(fn, *args)
+
+    def _replace_pool(self, broken):
+        """Swap a broken pool for a new one, once however many callers noticed"""
+        with self._pool_lock:
+            if self._pool is broken:
+                print("An inference worker died; starting a new worker pool")
+                broken.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(**self._pool_options)
+                # Snapshots of the dead workers would keep their gauges forever
+                self._worker_metrics.clear()
+            return self._pool
+
+    def run_batch(self, images, timings=None, method="run_batch"):
+        """Blocking equivalent of RecognitionPipeline.run_batch()"""
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                results = self.submit_batch(images, timings, method).result()
+                break
+            except BrokenProcessPool:
+                # A worker died while this batch was queued or running
+                self._replace_pool(pool)
+                if attempt:
+                    raise
+
+        # Timings were filled in by the worker; copy them back into the
+        # caller's dicts so callers holding a reference see the stages
+        if timings is not None:
+            for t, result in zip(timings, results):
+                t.update(result["timings"])
+                result["timings"] = t
+        return results
+
+    def run(self, image, timings=None):
+        """Blocking equivalent of RecognitionPipeline.run()"""
+        return self.run_batch([image], None if timings is None else [timings])[0]
+
+    def run_multi_batch(self, images, timings=None):
+        """Blocking equivalent of RecognitionPipeline.run_multi_batch()"""
+        return self.run_batch(images, timings, method="run_multi_batch")
+
+    def run_multi(self, image, timings=None):
+        """Blocking equivalent of RecognitionPipeline.run_multi()"""
+        return self.run_multi_batch([image], None if timings is None else [timings])[0]
+
+    def embed_batch(self, images, timings=None):
+        """Blocking equivalent of RecognitionPipeline.embed_batch()"""
+        return self.run_batch(images, timings, method="embed_batch")
+
+    def start(self):
+        """Start every worker now instead of on the first request"""
+        futures = [self._submit(os.getpid) for _ in range(self.num_workers)]
+        return sorted({future.result() for future in futures})
+
+    def model_stats(self):
+        """Model registry stats from one of the workers"""
+        return self._submit(_model_stats).result()
+
+    def _collect_metrics(self):
+        while True:
+            item = self._metrics_queue.get()
+            if item is None:
+                return
+            pid, snapshot = item
+            self._worker_metrics[pid] = snapshot
+
+    def worker_metrics(self):
+        """Latest metrics.snapshot() of each worker that has run a batch"""
+        return list(self._worker_metrics.values())
+
+    def request_reload(self):
+        """Ask every worker to rebuild its gallery in the background"""
+        with self._reload_signal.get_lock():
+            self._reload_signal.value += 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+        self._metrics_queue.put(None)
+        self._metrics_thread.join()
@@ -5,6 +5,7 @@ import os
 from datetime import datetime
 from io import BytesIO
 import sys
+import json
 
 # Include backend path
 sys.path.append("Backend")  # Update path to match your structure
@@ -14,11 +15,40 @@ from services.detection import detect_face
 from services.utils import preprocess_face
 
 API_URL = "http://localhost:8000/recognize"
+STREAM_URL = "ws://localhost:8000/recognize/stream"
 DATASET_DIR = "dataset"
 
 os.makedirs(DATASET_DIR, exist_ok=True)
 cap = cv2.VideoCapture(0)
 
+if "--stream" in sys.argv:
+    # Continuous mode: send every frame over a WebSocket and draw the tracked faces
+    from websockets.sync.client import connect
+
+    with connect(STREAM_URL) as ws:
+        reply = {}
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            ws.send(cv2.imencode('.jpg', frame)[1].tobytes())
+            reply = json.loads(ws.recv())
+            for face in reply.get("faces", []):
+                x1, y1, x2, y2 = face["box"]
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, face["identity"] or "...", (x1, max(0, y1 - 8)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+            cv2.imshow("Streaming, press 'q' to quit", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+        print("Stream stats:", reply.get("stats"))
+
+    cap.release()
+    cv2.destroyAllWindows()
+    sys.exit(0)
+
 while True:
     ret, frame = cap.read()
     if not ret: